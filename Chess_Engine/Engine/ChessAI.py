@@ -1,7 +1,19 @@
 import random
-import numpy as np
+import time
+import sys
+import queue
+import multiprocessing
+import atexit
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
 import chess, chess.polyglot
-from ChessEngine import Move
+import ChessEngine
+from ChessBitboard import IterateSquares, PopCount, PawnAttacks, FULL_BOARD, ROW_MASKS, FILE_MASKS
+from ChessAttackTables import KING_ATTACKS, RookAttacks
+from ChessTransposition import TranspositionTable, SharedTranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+from ChessPawnHash import PawnHashTable
+from ChessEvaluationCache import EvaluationCache
+from ChessEvaluationTables import pieceScore, Piece_Influence_Scores, MAX_PHASE, KING_SAFETY_PHASE
 import os
 
 # Global variable to hold the book reader
@@ -10,105 +22,87 @@ _book_path = os.path.join(os.path.dirname(__file__), "komodo.bin")
 
 next_move = None
 counter = 0
+q_counter = 0 # positions seen by the Quiescence Search, counted apart from the main search
 
 
-# Piece Scores as per Chess rules
-pieceScore = {"K": 200, "Q": 9, "R": 5, "B": 3, "N": 3, "P": 1}
 CHECKMATE = 1000
 STALEMATE = 0
 DEPTH = 5
 Q_SEARCH_DEPTH = 2
-
-# Killer moves: two slots per depth (adjust MAX_DEPTH as needed)
-killer_moves = [[] for _ in range(DEPTH + 1)]
-
-# History table: tracks successful moves (move identifier -> score)
+MAX_PLY = 64 # scores within MAX_PLY of CHECKMATE are mate scores
+TT_SIZE_MB = 16 # memory budget of the transposition table
+
+# Iterative deepening and time management
+MAX_SEARCH_DEPTH = 32 # deepest iteration of the iterative deepening search
+TIME_LIMIT_MS = 5000 # default time budget per move
+MOVES_TO_GO = 30 # number of moves the remaining clock time is shared between
+PONDER_HIT_MIN_SHARE = 0.1 # after a ponder hit the search still gets this share of its time, however long it pondered
+search_depth = DEPTH # depth of the current iteration (Root Node is at depth == search_depth)
+search_deadline = float("inf") # time.perf_counter() value at which the search has to stop
+search_soft_deadline = float("inf") # no new iteration is started after it, as it wouldn't finish in the time left
+search_stopped = False # set once the deadline is passed, the search then unwinds without using the unfinished scores
+
+# Parallel search (Lazy SMP)
+WORKERS = 1 # processes searching each position, 1 -> the search runs in the calling process only. Read at every search
+# (workers=None), so it can be changed while the program runs (the engine process's setoption command)
+STOP_CHECK_NODES = 64 # the stop flag (stop_event) is checked every STOP_CHECK_NODES nodes, a few ms of search
+stop_event = None # stop flag polled by the search (anything with is_set()), e.g. a multiprocessing.Event
+PARALLEL_MODE = "lazy_smp" # how more than one worker searches: "lazy_smp" (Parallel_Search) or "root_split" (Root_Split_Search)
+lazy_smp_table = None # SharedTranspositionTable of the Lazy SMP search, kept with its helpers from move to move (see Start_Lazy_SMP_Helpers())
+lazy_smp_helpers = [] # (process, connection) of every Lazy SMP helper, waiting on its connection for the next search
+lazy_smp_results = None # multiprocessing.Queue the helpers report their iterations on
+lazy_smp_stop = None # multiprocessing.Event stopping the helpers' search
+lazy_smp_search_id = 0 # number of the last Lazy SMP search, reports of older searches are dropped
+worker_game_state = None # in a search process, the game state of the last Load_Game_Position()
+worker_position = None # and the Game_Position() it is at
+root_split_pool = None # ProcessPoolExecutor of the root split search, kept from move to move (see Get_Root_Split_Pool())
+root_split_workers = 0 # number of processes in root_split_pool
+root_split_scores = None # multiprocessing.Arrays the pool shares: best root score found so far at each depth
+root_split_moves = None # and the moveID which got it
+shared_root_alpha = None # the same two arrays inside a pool process, None everywhere else
+shared_root_move = None
+
+# Search enhancements, each can be switched off to compare node counts against the plain alpha-beta search
+USE_PVS = True # Principal Variation Search: null window scouts for every move after the first
+USE_ASPIRATION = True # searching each iteration with a window around the previous iteration's score
+ASPIRATION_WINDOW = 30 # half width of the first aspiration window, doubled after every fail
+research_counter = 0 # PVS scouts which failed high and aspiration windows which failed, both needing a re-search
+USE_NULL_MOVE = True # Null move pruning: letting the opponent move twice, if we still fail high the node is pruned
+NULL_MOVE_REDUCTION = 2 # depth reduction (R) of the null move search
+USE_LMR = True # Late Move Reductions: quiet moves ordered late are searched with less depth first
+LMR_MIN_DEPTH = 3 # no reductions close to the leaves
+LMR_MIN_MOVES = 3 # number of moves searched at full depth before reducing
+LMR_LATE_MOVES = 8 # moves ordered after this are reduced by 2 plies instead of 1
+USE_LAZY_EVAL = True # Lazy evaluation: skipping the coordination terms when the cheap terms are already outside the window
+LAZY_EVAL_MARGIN = 120 # bound on what the skipped terms can add, larger than they were in 99.9% of sampled positions
+lazy_eval_skips = 0 # evaluations which returned before the coordination terms
+full_evaluations = 0 # evaluations which computed every term
+
+# Principal variation: pv_table[ply] is the best line found from the node at that ply
+pv_table = [[] for _ in range(MAX_PLY + 1)]
+previous_pv = [] # principal variation of the last completed iteration, searched first in the next one
+follow_pv = False # True while the search is still on the previous principal variation
+
+# Transposition table: results of already searched positions keyed by the Zobrist position key
+transposition_table = TranspositionTable(TT_SIZE_MB, CHECKMATE - MAX_PLY)
+
+# Pawn hash table: evaluation of pawn structures keyed by the pawn hash of the bitboards
+PAWN_HASH_ENTRIES = 16384
+pawn_hash_table = PawnHashTable(PAWN_HASH_ENTRIES)
+
+# Evaluation cache: scores of evaluated positions keyed by the piece placement hash, kept for the whole game
+EVAL_CACHE_SIZE_MB = 4
+eval_cache = EvaluationCache(EVAL_CACHE_SIZE_MB)
+
+# Killer moves: two slots per depth (up to MAX_SEARCH_DEPTH), stored as moveIDs
+killer_moves = [[] for _ in range(MAX_SEARCH_DEPTH + 1)]
+
+# History table: tracks successful moves (moveID -> score)
 history_table = {}
 
 # Counter moves: to keep track of moves that gave strong responses to the opponent's last move
-counter_moves = {} # Key: (opponent_move_id), Value: best_response_move
-
-# defining piece influence value/weights for improved evaluation
-KnightScores = np.array([
-    [3, 10, 20, 20, 20, 20, 10, 3],
-    [10, 30, 40, 40, 40, 40, 30, 10],
-    [20, 40, 50, 55, 55, 50, 40, 20],
-    [20, 45, 55, 65, 65, 55, 45, 20],
-    [20, 45, 55, 65, 65, 55, 45, 20],
-    [20, 40, 50, 55, 55, 50, 40, 20],
-    [10, 30, 40, 40, 40, 40, 30, 10],
-    [3, 10, 20, 20, 20, 20, 10, 3]
-])
-
-BishopScores = np.array([
-    [10, 10, 10, 10, 10, 10, 10, 10],
-    [10, 20, 20, 20, 20, 20, 20, 10],
-    [10, 25, 30, 30, 30, 30, 25, 10],
-    [10, 25, 35, 40, 40, 35, 25, 10],
-    [10, 25, 40, 40, 40, 40, 25, 10],
-    [10, 30, 30, 30, 30, 30, 30, 10],
-    [10, 20, 25, 20, 20, 25, 20, 10],
-    [10, 10, 10, 10, 10, 10, 10, 10]
-])
-
-RookScores = np.array([
-    [10, 10, 10, 15, 15, 10, 10, 10],
-    [20, 20, 20, 20, 20, 20, 20, 20],
-    [5, 7, 10, 15, 15, 10, 7, 5],
-    [5, 7, 10, 10, 10, 10, 7, 5],
-    [5, 7, 10, 10, 10, 10, 7, 5],
-    [5, 7, 10, 15, 15, 10, 7, 5],
-    [20, 20, 20, 20, 20, 20, 20, 20],
-    [10, 10, 10, 15, 15, 10, 10, 10]
-])
-
-QueenScores = np.array([
-    [5, 10, 10, 15, 15, 10, 10, 5],
-    [10, 20, 25, 25, 25, 25, 20, 10],
-    [10, 25, 30, 35, 35, 30, 25, 10],
-    [15, 25, 35, 40, 40, 35, 25, 15],
-    [15, 25, 35, 40, 40, 35, 25, 15],
-    [10, 25, 30, 35, 35, 30, 25, 10],
-    [10, 20, 25, 25, 25, 25, 20, 10],
-    [5, 10, 10, 15, 15, 10, 10, 5]
-])
-
-KingScores = np.array([
-    [20, 30, 10, 5, 5, 10, 30, 20],
-    [10, 20, 5, 2, 2, 5, 20, 10],
-    [5, 10, 2, 2, 2, 2, 10, 5],
-    [1, 5, 1, 10, 10, 1, 5, 0],
-    [1, 5, 1, 10, 10, 1, 5, 0],
-    [5, 10, 2, 2, 2, 2, 10, 5],
-    [10, 20, 5, 2, 2, 5, 20, 10],
-    [20, 30, 10, 5, 5, 10, 30, 20]
-])
-
-WhitePawnScores = np.array([
-    [50, 50, 50, 50, 50, 50, 50, 50],# promotion incentive
-    [40, 40, 40, 40, 40, 40, 40, 40],
-    [30, 30, 35, 35, 35, 35, 30, 30],
-    [20, 20, 25, 30, 30, 25, 20, 20],
-    [10, 10, 15, 25, 25, 15, 10, 10],
-    [5, 5, 10, 15, 15, 10, 5, 5],
-    [0, 0, 0, 0, 0, 0, 0, 0],         # starting position
-    [0, 0, 0, 0, 0, 0, 0, 0]
-])
-
-
-BlackPawnScores = np.array([
-    [0, 0, 0, 0, 0, 0, 0, 0],
-    [0, 0, 0, 0, 0, 0, 0, 0],        # starting position
-    [5, 5, 10, 15, 15, 10, 5, 5],
-    [10, 10, 15, 25, 25, 15, 10, 10],
-    [20, 20, 25, 30, 30, 25, 20, 20],
-    [30, 30, 35, 35, 35, 35, 30, 30],
-    [40, 40, 40, 40, 40, 40, 40, 40],
-    [50, 50, 50, 50, 50, 50, 50, 50]  # promotion incentive
-])
-
-Piece_Influence_Scores = {"N" : KnightScores, "B": BishopScores, "R": RookScores, "Q": QueenScores,
-                          "K": KingScores, "wP": WhitePawnScores, "bP": BlackPawnScores }
+counter_moves = {} # Key: opponent's moveID, Value: moveID of the best response
+
 '''
 Choosing a random move from the validMoves list
 '''
@@ -127,7 +121,7 @@ def FindBestMove(game_state, validMoves):
     best_player_move = None
     random.shuffle(validMoves)
     for playerMove in validMoves:
-        game_state.MakeMove(playerMove)
+        game_state.MakeMove(playerMove, search=True)
         opponent_moves = game_state.GetValidMoves()
         if game_state.Stalemate:
             opponent_max_score = STALEMATE
@@ -136,7 +130,7 @@ def FindBestMove(game_state, validMoves):
         else:
             opponent_max_score = -CHECKMATE
             for opponent_move in opponent_moves:
-                game_state.MakeMove(opponent_move)
+                game_state.MakeMove(opponent_move, search=True)
                 game_state.GetValidMoves()
                 if game_state.Checkmate:
                     score = CHECKMATE
@@ -146,11 +140,11 @@ def FindBestMove(game_state, validMoves):
                     score = -turn_multiplier * scoreMaterial(game_state.board_array)
                 if score > opponent_max_score:
                     opponent_max_score = score
-                game_state.UndoMove()
+                game_state.UndoMove(search=True)
         if  opponent_max_score < opponent_min_max_score :
             opponent_min_max_score = opponent_max_score
             best_player_move = playerMove
-        game_state.UndoMove()
+        game_state.UndoMove(search=True)
     return best_player_move
 
 ############################################################################################################
@@ -167,7 +161,7 @@ def MinMax(game_state, validMoves, depth, whiteToMove):
     if whiteToMove:
         max_score = -CHECKMATE
         for move in validMoves:
-            game_state.MakeMove(move)
+            game_state.MakeMove(move, search=True)
             next_moves = game_state.GetValidMoves()
             score = MinMax(game_state, next_moves, depth - 1, False)
             if score > max_score:
@@ -175,12 +169,12 @@ def MinMax(game_state, validMoves, depth, whiteToMove):
                 if depth == DEPTH:
                     next_move = move
                     print(f"Move: {move}, Score: {score}")
-            game_state.UndoMove()
+            game_state.UndoMove(search=True)
         return max_score
     else:
         min_score = CHECKMATE
         for move in validMoves:
-            game_state.MakeMove(move)
+            game_state.MakeMove(move, search=True)
             next_moves = game_state.GetValidMoves()
             score = MinMax(game_state, next_moves, depth - 1, True)
             if score < min_score:
@@ -188,7 +182,7 @@ def MinMax(game_state, validMoves, depth, whiteToMove):
                 if depth == DEPTH:
                     next_move = move
                     print(f"Move: {move}, Score: {score}")
-            game_state.UndoMove()
+            game_state.UndoMove(search=True)
         return min_score
 
 '''
@@ -219,7 +213,7 @@ def NegaMax(game_state, validMoves, depth, turn_multiplier):
 
     max_score = -CHECKMATE
     for move in validMoves:
-        game_state.MakeMove(move)
+        game_state.MakeMove(move, search=True)
         next_moves = game_state.GetValidMoves()
         score = -NegaMax(game_state, next_moves, depth - 1, -turn_multiplier)
         if score > max_score:
@@ -227,7 +221,7 @@ def NegaMax(game_state, validMoves, depth, turn_multiplier):
             if depth == DEPTH:
                 next_move = move
                 print(f"Move: {move}, Score: {score}")
-        game_state.UndoMove()
+        game_state.UndoMove(search=True)
     return max_score
 
 '''
@@ -247,44 +241,127 @@ def FindBestMove_NegaMax(game_state, validMoves):
 '''
 NegaMax with Alpha-Beta pruning implementation 
 '''
-def NegaMax_AB_Pruning(game_state, validMoves, depth, alpha, beta, turn_multiplier, previous_move=None): # alpha -> Upper bound value, beta -> Lower bound value
-    global next_move, counter
+def NegaMax_AB_Pruning(game_state, validMoves, depth, alpha, beta, turn_multiplier, previous_move=None, ply=0, allow_null=True): # alpha -> Upper bound value, beta -> Lower bound value
+    # ply -> number of moves from the Root Node, it no longer follows from depth once moves are reduced
+    global next_move, counter, search_stopped, follow_pv, research_counter
     counter += 1 # Counting the number of position states visited
+    pv_table[ply] = []
+    # Stopping the search once the time is up, the unfinished scores are thrown away by the callers
+    if search_stopped or time.perf_counter() >= search_deadline or \
+            (stop_event is not None and counter % STOP_CHECK_NODES == 0 and stop_event.is_set()):
+        search_stopped = True
+        return 0
     if depth == 0:
-        return Quiescence_Search(game_state, alpha, beta, turn_multiplier, Q_SEARCH_DEPTH)
+        return Quiescence_Search(game_state, alpha, beta, turn_multiplier, Q_SEARCH_DEPTH, ply)
+
+    # Transposition table lookup: a stored result from an equal or deeper search can be used directly
+    original_alpha = alpha
+    tt_move = 0
+    tt_entry = transposition_table.Probe(game_state.position_key, ply)
+    if tt_entry is not None:
+        tt_depth, tt_score, tt_flag, tt_move = tt_entry
+        if tt_depth >= depth and ply != 0: # Not at the Root Node as it has to set next_move
+            if tt_flag == EXACT:
+                return tt_score
+            if tt_flag == LOWER_BOUND and tt_score >= beta:
+                return tt_score
+            if tt_flag == UPPER_BOUND and tt_score <= alpha:
+                return tt_score
+
+    # Principal variation move of the previous iteration, only while we are still on that line
+    pv_move = previous_pv[ply] if follow_pv and ply < len(previous_pv) else None
+
+    # Null move pruning: if passing the turn still gives a score >= beta, a real move will too. Only tried at null
+    # window (non principal variation) nodes, so the principal variation is never cut by it, and not allowed in check
+    # (passing would be illegal), twice in a row or without pieces other than pawns, where zugzwang is common
+    in_check = game_state.inCheck()
+    if USE_NULL_MOVE and allow_null and ply != 0 and beta - alpha == 1 and depth > NULL_MOVE_REDUCTION and not in_check \
+            and beta < CHECKMATE - MAX_PLY and Has_Non_Pawn_Material(game_state):
+        game_state.MakeNullMove()
+        null_moves = game_state.GetValidMoves()
+        if null_moves:
+            score = -NegaMax_AB_Pruning(game_state, null_moves, depth - 1 - NULL_MOVE_REDUCTION, -beta, -beta + 1,
+                                        -turn_multiplier, ply=ply + 1, allow_null=False)
+            game_state.UndoNullMove()
+            if search_stopped:
+                return 0
+            if score >= beta:
+                return beta
+        else:
+            game_state.UndoNullMove()
 
     # Move ordering
-    ordered_moves = Move_Ordering(game_state, validMoves, depth)
+    ordered_moves = Move_Ordering(game_state, validMoves, depth, tt_move=tt_move, pv_move=pv_move)
     max_score = -CHECKMATE
+    best_move = None
     # starting the search process
-    for move in ordered_moves:
-        game_state.MakeMove(move)
+    for move_number, move in enumerate(ordered_moves):
+        game_state.MakeMove(move, search=True)
         next_moves = game_state.GetValidMoves()
         if game_state.Checkmate: # checking for checkmates during searching
-            game_state.UndoMove()
-            score = CHECKMATE - (DEPTH - depth) # adjusting score to checkmate exponentially more value based on how quickly deliverable
-            if depth == DEPTH: # Root Node
+            game_state.UndoMove(search=True)
+            score = CHECKMATE - ply # adjusting score to checkmate exponentially more value based on how quickly deliverable
+            if ply == 0: # Root Node
+                next_move = move
                 print(f"Move: {move}, Score: {score} (Checkmate)")
+            pv_table[ply] = [move]
+            transposition_table.Store(game_state.position_key, depth, score, EXACT, move.moveID, ply)
+            if ply == 0 and shared_root_alpha is not None:
+                Share_Root_Score(depth, score, move)
             return score # Return immediately to prioritize checkmate
-        # calling decision algorithm recursively
-        score = -NegaMax_AB_Pruning(game_state, next_moves, depth - 1, -beta, -alpha,  -turn_multiplier) # switching alpha and beta for the opponent moves
-        game_state.UndoMove()
+        # Root splitting: the best root score of all the workers is a lower bound for this worker's moves too. Kept
+        # one below it, so a move with the same score still gets its exact score and ties are settled the same way
+        # whichever worker got there first (see Share_Root_Score())
+        if ply == 0 and shared_root_alpha is not None and shared_root_alpha[depth] - 1 > alpha:
+            alpha = min(shared_root_alpha[depth] - 1, beta - 1)
+        # calling decision algorithm recursively, only the principal variation move continues the previous line
+        follow_pv = pv_move is not None and move == pv_move
+        # LMR: late quiet moves are unlikely to be best, they get a reduced depth unless they give check
+        # (game_state.inCheckFlag is set by GetValidMoves() for the position after the move)
+        reduction = 0
+        if USE_LMR and depth >= LMR_MIN_DEPTH and move_number >= LMR_MIN_MOVES and not in_check \
+                and not move.IsCaptured and not move.PawnPromotion and not game_state.inCheckFlag \
+                and move.moveID not in killer_moves[depth]:
+            reduction = 1 if move_number < LMR_LATE_MOVES else 2
+        if best_move is None or not (USE_PVS or reduction): # first move (expected best) is searched with the full window
+            score = -NegaMax_AB_Pruning(game_state, next_moves, depth - 1, -beta, -alpha,  -turn_multiplier, ply=ply + 1) # switching alpha and beta for the opponent moves
+        else:
+            # PVS: proving the move is not better than alpha with a null window, a re-search is only needed if it is
+            score = -NegaMax_AB_Pruning(game_state, next_moves, depth - 1 - reduction, -alpha - 1, -alpha, -turn_multiplier, ply=ply + 1)
+            if reduction and score > alpha and not search_stopped: # the reduced move beat alpha, checking it at full depth
+                research_counter += 1
+                if USE_PVS:
+                    score = -NegaMax_AB_Pruning(game_state, next_moves, depth - 1, -alpha - 1, -alpha, -turn_multiplier, ply=ply + 1)
+                else:
+                    score = -NegaMax_AB_Pruning(game_state, next_moves, depth - 1, -beta, -alpha, -turn_multiplier, ply=ply + 1)
+            if USE_PVS and alpha < score < beta and not search_stopped:
+                research_counter += 1
+                score = -NegaMax_AB_Pruning(game_state, next_moves, depth - 1, -beta, -alpha, -turn_multiplier, ply=ply + 1)
+        follow_pv = False
+        game_state.UndoMove(search=True)
+        if search_stopped: # the score of an interrupted search can't be trusted
+            return 0
 
         if score > max_score:
             max_score = score
-            if depth == DEPTH: # Root Node
+            # at the Root Node a move only replaces the first one when it beats alpha, a failed low score is
+            # just an upper bound which can't be compared
+            if ply == 0 and (best_move is None or score > alpha): # Root Node
                 next_move = move
                 print(f"Move: {move}, Score: {score}")
+            best_move = move
 
         # Pruning bad game state trees which don't much of an advantage
         if max_score > alpha:
             alpha = max_score # set the max_score to alpha for the best game state tree
+            pv_table[ply] = [move] + pv_table[ply + 1] # new best line from this node
+            if ply == 0 and shared_root_alpha is not None and max_score < beta: # exact score, the other workers can use it
+                Share_Root_Score(depth, max_score, move)
 
         # Beta Cutoff: updating heuristics here
         if alpha >= beta:
             # updating history table for the move causing cutoff
-            promoted_to = move.Pawn_Promoted_to if move.PawnPromotion else None
-            move_id = (move.startRow, move.startCol, move.endRow, move.endCol, promoted_to)
+            move_id = move.moveID
             if move_id not in history_table:
                 history_table[move_id] = 0
             history_table[move_id] += min(history_table[move_id] + depth ** 2, 30)  # Cap at 30
@@ -292,73 +369,509 @@ def NegaMax_AB_Pruning(game_state, validMoves, depth, alpha, beta, turn_multipli
 
             # Updating counter moves if there was a previous move
             if previous_move is not None:
-                opponent_move_id = (previous_move.startRow, previous_move.startCol,
-                                    previous_move.endRow, previous_move.endCol)
-                counter_moves[opponent_move_id] = move
+                counter_moves[previous_move.moveID] = move_id
 
             # Updating killer moves
             if not move.IsCaptured: # Quiet moves only
-                if move not in killer_moves[depth]:
+                if move_id not in killer_moves[depth]:
                     if len(killer_moves[depth]) < 2:
-                        killer_moves[depth].append(move)
+                        killer_moves[depth].append(move_id)
                     else:
                         killer_moves[depth][1] = killer_moves[depth][0] # Shifting older killer move
-                        killer_moves[depth][0] = move # New killer in first slot
+                        killer_moves[depth][0] = move_id # New killer in first slot
             break # prune the rest of the game state tree for the current move
+
+    # Storing the result with its bound type for the next time this position is reached
+    if max_score <= original_alpha:
+        tt_flag = UPPER_BOUND
+    elif max_score >= beta:
+        tt_flag = LOWER_BOUND
+    else:
+        tt_flag = EXACT
+    transposition_table.Store(game_state.position_key, depth, max_score, tt_flag,
+                              best_move.moveID if best_move is not None else 0, ply)
     return max_score
 
+'''
+Null move pruning is only safe with pieces other than pawns and the king, in pawn endings zugzwang is common
+and passing the turn would look better than any real move
+'''
+def Has_Non_Pawn_Material(game_state):
+    pieces = game_state.bitboards.pieces
+    color = "w" if game_state.whiteToMove else "b"
+    return bool(pieces[color + "N"] | pieces[color + "B"] | pieces[color + "R"] | pieces[color + "Q"])
+
+'''
+Share of the clock to spend on one move: the remaining time split over MOVES_TO_GO moves plus most of the increment,
+never more than half of the time left
+'''
+def AllocateTime(time_left_ms, increment_ms=0, moves_to_go=MOVES_TO_GO):
+    return min(time_left_ms / moves_to_go + increment_ms * 0.8, time_left_ms * 0.5)
+
+'''
+Starts the clock of the running search again with a new time budget, for a ponder search (searched without a time
+limit) which becomes the real search once the expected move is played. The spent_ms it already searched the position
+are taken off the budget, down to PONDER_HIT_MIN_SHARE of it
+'''
+def Set_Search_Time(time_limit_ms, spent_ms=0):
+    global search_deadline, search_soft_deadline
+    time_limit_ms = max(time_limit_ms - spent_ms, time_limit_ms * PONDER_HIT_MIN_SHARE)
+    now = time.perf_counter()
+    search_deadline = now + time_limit_ms / 1000
+    search_soft_deadline = now + time_limit_ms / 2000
+
+'''
+Iterative deepening driver: searches depth 1, 2, 3 ... until the time budget runs out. Every finished iteration leaves
+a best move in next_move, and its principal variation (plus the transposition table) orders the next iteration so the
+deeper searches cost little more than searching the last depth directly.
+start_depth -> first iteration searched, report -> called with the progress record of every finished iteration: a dict
+of depth, score (for the side to move), nodes (with the quiescence nodes), nps, time_ms, pv (moves as text) and move
+(the best Move)
+'''
+def Iterative_Deepening(game_state, validMoves, time_limit_ms, max_depth=MAX_SEARCH_DEPTH, start_depth=1, report=None):
+    global next_move, search_depth, search_deadline, search_soft_deadline, search_stopped, previous_pv, follow_pv, research_counter
+    start_time = time.perf_counter()
+    search_deadline = start_time + time_limit_ms / 1000
+    search_soft_deadline = start_time + time_limit_ms / 2000
+    search_stopped = False
+    research_counter = 0
+    previous_pv = []
+    best_move = None
+    score = 0
+    for depth in range(start_depth, max_depth + 1):
+        search_depth = depth
+        # Aspiration window around the previous iteration's score, widened on the failing side until the score fits
+        window = ASPIRATION_WINDOW
+        if USE_ASPIRATION and depth > start_depth:
+            alpha, beta = max(score - window, -CHECKMATE), min(score + window, CHECKMATE)
+        else:
+            alpha, beta = -CHECKMATE, CHECKMATE
+        while True:
+            follow_pv = True
+            score = NegaMax_AB_Pruning(game_state, validMoves, depth, alpha, beta, 1 if game_state.whiteToMove else -1, previous_move=None)
+            if search_stopped:
+                break
+            window *= 2
+            if score <= alpha and alpha > -CHECKMATE: # failed low
+                alpha = max(score - window, -CHECKMATE)
+            elif score >= beta and beta < CHECKMATE: # failed high
+                beta = min(score + window, CHECKMATE)
+            else:
+                break
+            research_counter += 1
+        # Root moves finished before the stop are still usable as the previous best move is searched first
+        best_move = next_move
+        if search_stopped:
+            break
+        previous_pv = pv_table[0][:]
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        print(f"Depth: {depth}, Score: {score}, Nodes: {counter} (+{q_counter} quiescence), Re-searches: {research_counter}, Time: {elapsed_ms:.0f} ms, PV: {' '.join(str(move) for move in previous_pv)}")
+        if report is not None:
+            nodes = counter + q_counter
+            report({"depth": depth, "score": score, "nodes": nodes, "nps": int(nodes * 1000 / max(elapsed_ms, 1)),
+                    "time_ms": int(elapsed_ms), "pv": [str(move) for move in previous_pv], "move": best_move})
+        # Stopping between iterations: a forced mate is found or the next iteration won't finish in the time left
+        if abs(score) > CHECKMATE - MAX_PLY or time.perf_counter() >= search_soft_deadline:
+            break
+    search_deadline = float("inf")
+    search_soft_deadline = float("inf")
+    search_depth = DEPTH
+    next_move = best_move
+    return best_move
+
+'''
+The game a search process is sent instead of a pickled GameState: the FEN it started from (None for the standard
+starting position) and its moves in coordinate notation
+'''
+def Game_Position(game_state):
+    return game_state.start_fen, [move.GetUCI() for move in game_state.moveLog]
+
+'''
+GameState of a Game_Position() in a search process. The game state of the last call is kept, when the game went on
+from it (the usual case from one AI move to the next) only the new moves are made
+'''
+def Load_Game_Position(position):
+    global worker_game_state, worker_position
+    start_fen, moves = position
+    if worker_game_state is None or worker_position[0] != start_fen or \
+            worker_position[1] != moves[:len(worker_position[1])]:
+        worker_game_state = ChessEngine.GameState()
+        if start_fen is not None:
+            worker_game_state.LoadFEN(start_fen)
+        worker_position = (start_fen, [])
+    for text in moves[len(worker_position[1]):]:
+        worker_game_state.MakeMove(worker_game_state.ParseMove(text))
+    worker_position = (start_fen, moves)
+    return worker_game_state
+
+'''
+Lazy SMP: workers processes search the same root position at once and share one transposition table in shared memory.
+This process runs the main search, the helpers start on alternating depths and with the root moves shuffled (ties of
+the move ordering then go differently), so they fill the table with results the main search finds instead of
+searching them itself. The parallel search ends with the main search (time_limit_ms or max_depth), which stops the
+helpers. Of all the finished iterations the deepest one gives the move, ties going to the lowest worker number (the
+main search is worker 0), so the choice doesn't depend on which process reported first.
+The shared table and the helpers are started on the first call and kept for the following moves, like the root split
+pool, so the table keeps the results of the previous searches
+'''
+def Parallel_Search(game_state, validMoves, time_limit_ms, workers=None, max_depth=MAX_SEARCH_DEPTH, progress=None):
+    global transposition_table, lazy_smp_search_id
+    workers = WORKERS if workers is None else workers
+    local_table = transposition_table
+    Start_Lazy_SMP_Helpers(workers)
+    lazy_smp_search_id += 1
+    lazy_smp_stop.clear()
+    lazy_smp_table.NewSearch()
+    position = Game_Position(game_state)
+    for process, connection in lazy_smp_helpers:
+        connection.send((lazy_smp_search_id, position, lazy_smp_table.age, time_limit_ms, max_depth))
+    reports = [] # (depth, worker, score, moveID) of every finished iteration
+    def Main_Report(record): # iterations of the main search, progress only follows the main search
+        reports.append((record["depth"], 0, record["score"], record["move"].moveID))
+        if progress is not None:
+            progress(record)
+    try:
+        transposition_table = lazy_smp_table
+        Iterative_Deepening(game_state, validMoves, time_limit_ms, max_depth, report=Main_Report)
+    finally:
+        transposition_table = local_table
+        lazy_smp_stop.set()
+    # every helper puts (search number, None) once it has stopped
+    finished = 0
+    while finished < len(lazy_smp_helpers):
+        try:
+            search_id, report = lazy_smp_results.get(timeout=1)
+        except queue.Empty:
+            break
+        if search_id != lazy_smp_search_id: # a helper which was late to stop the search before
+            continue
+        if report is None:
+            finished += 1
+        else:
+            reports.append(report)
+    if not reports:
+        return next_move
+    depth, worker, score, move_id = max(reports, key=lambda report: (report[0], -report[1]))
+    # the table stats are of the main search, the helpers count their own probes
+    print(f"Parallel search: {workers} workers, depth {depth} of worker {worker}, Score: {score}, "
+          f"Main search nodes: {counter} (+{q_counter} quiescence), Shared {lazy_smp_table.Stats()}, {Lazy_Eval_Stats()}")
+    return next((move for move in validMoves if move.moveID == move_id), next_move)
+
+'''
+Creates the shared table and starts the workers - 1 helper processes of Parallel_Search(), only when they aren't
+running yet or the number of workers changed
+'''
+def Start_Lazy_SMP_Helpers(workers):
+    global lazy_smp_table, lazy_smp_results, lazy_smp_stop
+    if lazy_smp_table is not None and len(lazy_smp_helpers) == workers - 1:
+        return
+    Close_Lazy_SMP_Helpers()
+    lazy_smp_table = SharedTranspositionTable(TT_SIZE_MB, CHECKMATE - MAX_PLY)
+    lazy_smp_results = multiprocessing.Queue()
+    lazy_smp_stop = multiprocessing.Event()
+    for worker in range(1, workers):
+        connection, helper_connection = multiprocessing.Pipe()
+        # daemon processes: the helpers go away with this process if it is terminated
+        process = multiprocessing.Process(target=Lazy_SMP_Helper, daemon=True,
+                                          args=(helper_connection, worker, lazy_smp_table.name, lazy_smp_stop, lazy_smp_results))
+        process.start()
+        lazy_smp_helpers.append((process, connection))
+
+'''
+Stops the helpers and frees the shared table, also run when the program exits
+'''
+def Close_Lazy_SMP_Helpers():
+    global lazy_smp_table, lazy_smp_helpers
+    if lazy_smp_stop is not None:
+        lazy_smp_stop.set()
+    for process, connection in lazy_smp_helpers:
+        try:
+            connection.send(None)
+        except OSError: # the helper is already gone
+            pass
+    for process, connection in lazy_smp_helpers:
+        process.join(timeout=1)
+        if process.is_alive():
+            process.terminate()
+    lazy_smp_helpers = []
+    if lazy_smp_table is not None:
+        lazy_smp_table.Close()
+    lazy_smp_table = None
+
+atexit.register(Close_Lazy_SMP_Helpers)
+
+'''
+Helper process of Parallel_Search(), attached to the shared transposition table for its whole life. For every search
+(search number, Game_Position(), table age, time_limit_ms, max_depth) it receives, its finished iterations are put on
+the results queue as (search number, (depth, worker, score, moveID)), followed by (search number, None) once it has
+stopped. None ends the process
+'''
+def Lazy_SMP_Helper(connection, worker, table_name, stop, results):
+    global transposition_table, stop_event
+    transposition_table = SharedTranspositionTable(TT_SIZE_MB, CHECKMATE - MAX_PLY, name=table_name)
+    stop_event = stop
+    # only the main search prints its iterations
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        try:
+            while True:
+                job = connection.recv()
+                if job is None:
+                    break
+                search_id, position, table_age, time_limit_ms, max_depth = job
+                game_state = Load_Game_Position(position)
+                transposition_table.age = table_age # the same age as the main search's entries
+                transposition_table.ResetStats()
+                moves = game_state.GetValidMoves()
+                random.Random(worker).shuffle(moves) # seeded, so a helper always searches the same position the same way
+                try:
+                    Iterative_Deepening(game_state, moves, time_limit_ms, max_depth, start_depth=1 + worker % 2,
+                                        report=lambda record: results.put((search_id, (record["depth"], worker, record["score"], record["move"].moveID))))
+                finally:
+                    results.put((search_id, None))
+        finally:
+            transposition_table.Close()
+
+'''
+Time to reach a fixed depth with 1 to max_workers workers, the speed-up of Lazy SMP on this machine.
+Every run starts from empty tables and new helpers (started before the clock) so the runs don't help each other.
+Returns the times in seconds
+'''
+def Benchmark_Parallel_Search(game_state, depth, max_workers=8):
+    global next_move
+    times = []
+    print(f"Lazy SMP benchmark, depth {depth}, {multiprocessing.cpu_count()} CPUs")
+    for workers in range(1, max_workers + 1):
+        for table in killer_moves:
+            table.clear()
+        history_table.clear()
+        counter_moves.clear()
+        eval_cache.Clear()
+        pawn_hash_table.Clear()
+        next_move = None
+        validMoves = game_state.GetValidMoves()
+        Close_Lazy_SMP_Helpers()
+        Start_Lazy_SMP_Helpers(workers)
+        start_time = time.perf_counter()
+        stdout = sys.stdout
+        sys.stdout = open(os.devnull, "w")
+        try:
+            Parallel_Search(game_state, validMoves, float("inf"), workers, max_depth=depth)
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+        times.append(time.perf_counter() - start_time)
+        print(f"Workers: {workers}, Time: {times[-1]:.2f} s, Speed-up: {times[0] / times[-1]:.2f}")
+    Close_Lazy_SMP_Helpers()
+    return times
+
+'''
+Root splitting: the root moves are dealt out to the processes of a pool, each searching its share of them with
+iterative deepening. A worker's exact root scores go to shared arrays (per depth), and every worker starts its next
+root move with the best of them as alpha, so the later roots are searched with a tighter window. The move is the
+shared best of the deepest iteration every worker finished, moves with the same score going to the lower moveID.
+The pool is created on the first call and kept (with the tables its processes built) for the following moves, the
+workers are sent the game as Game_Position() instead of the whole GameState.
+Two searches of the same position can still give different moves: like the single process search they depend on the
+depth reached in the time and on what the previous searches left in the tables
+'''
+def Root_Split_Search(game_state, validMoves, time_limit_ms, workers=None, max_depth=MAX_SEARCH_DEPTH, progress=None):
+    workers = WORKERS if workers is None else workers
+    start_time = time.perf_counter()
+    pool = Get_Root_Split_Pool(workers)
+    with root_split_scores.get_lock():
+        for depth in range(MAX_SEARCH_DEPTH + 1):
+            root_split_scores[depth] = -CHECKMATE - 1 # below any score, nothing found yet
+            root_split_moves[depth] = 0
+    position = Game_Position(game_state)
+    # dealt out in turn, so every worker gets some of the moves ordered first
+    shares = [[move.moveID for move in validMoves[worker::workers]] for worker in range(workers)]
+    futures = [pool.submit(Root_Split_Worker, position, share, time_limit_ms, max_depth) for share in shares if share]
+    results = [future.result() for future in futures]
+    depth = min(result[0] for result in results)
+    # the search counters of the workers added up
+    main_nodes, q_nodes, tt_hits, tt_misses = [sum(result[index] for result in results) for index in range(1, 5)]
+    nodes = main_nodes + q_nodes
+    if depth == 0: # a worker didn't finish its first iteration
+        return validMoves[0] if validMoves else None
+    move_id = root_split_moves[depth]
+    print(f"Root split search: {workers} workers, Depth: {depth}, Score: {root_split_scores[depth]}, "
+          f"Nodes: {main_nodes} (+{q_nodes} quiescence), TT hits: {tt_hits}, misses: {tt_misses}")
+    best_move = next((move for move in validMoves if move.moveID == move_id), validMoves[0])
+    if progress is not None: # the workers' iterations aren't followed, only the result is reported
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        progress({"depth": depth, "score": root_split_scores[depth], "nodes": nodes, "nps": int(nodes * 1000 / max(elapsed_ms, 1)),
+                  "time_ms": int(elapsed_ms), "pv": [str(best_move)], "move": best_move})
+    return best_move
+
+'''
+The persistent pool of Root_Split_Search(), a new one is only made when the number of workers changes
+'''
+def Get_Root_Split_Pool(workers):
+    global root_split_pool, root_split_workers, root_split_scores, root_split_moves
+    if root_split_pool is None or root_split_workers != workers:
+        Close_Root_Split_Pool()
+        root_split_scores = multiprocessing.Array("i", MAX_SEARCH_DEPTH + 1)
+        root_split_moves = multiprocessing.Array("i", MAX_SEARCH_DEPTH + 1, lock=False) # written under the scores lock
+        root_split_pool = ProcessPoolExecutor(workers, initializer=Root_Split_Init, initargs=(root_split_scores, root_split_moves))
+        root_split_workers = workers
+    return root_split_pool
+
+def Close_Root_Split_Pool():
+    global root_split_pool, root_split_workers
+    if root_split_pool is not None:
+        root_split_pool.shutdown(cancel_futures=True)
+    root_split_pool = None
+    root_split_workers = 0
+
+'''
+Runs once in every process of the root split pool
+'''
+def Root_Split_Init(scores, moves):
+    global shared_root_alpha, shared_root_move
+    shared_root_alpha = scores
+    shared_root_move = moves
+
+'''
+Searches the root moves with the given moveIDs of the Game_Position() in a pool process, returns (deepest finished
+iteration, nodes, quiescence nodes, transposition table hits, misses)
+'''
+def Root_Split_Worker(position, move_ids, time_limit_ms, max_depth):
+    global next_move, counter, q_counter
+    next_move = None
+    counter = 0
+    q_counter = 0
+    transposition_table.NewSearch()
+    game_state = Load_Game_Position(position)
+    moves = [move for move in game_state.GetValidMoves() if move.moveID in move_ids]
+    depths = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull): # the main process prints the result
+        Iterative_Deepening(game_state, moves, time_limit_ms, max_depth, report=lambda record: depths.append(record["depth"]))
+    return (depths[-1] if depths else 0), counter, q_counter, transposition_table.hits, transposition_table.misses
+
+'''
+Keeps a root score in the shared arrays when it is the best one at that depth so far, of equal scores the move with
+the lower moveID (not the one found first, which depends on the timing of the workers)
+'''
+def Share_Root_Score(depth, score, move):
+    with shared_root_alpha.get_lock():
+        if score > shared_root_alpha[depth] or (score == shared_root_alpha[depth] and move.moveID < shared_root_move[depth]):
+            shared_root_alpha[depth] = score
+            shared_root_move[depth] = move.moveID
+
+'''
+Searching the position with Iterative_Deepening(), or in parallel the way PARALLEL_MODE sets when more than one
+worker is set (workers=None -> WORKERS)
+'''
+def Search_Position(game_state, validMoves, time_limit_ms, workers=None, progress=None):
+    workers = WORKERS if workers is None else workers
+    if workers > 1:
+        if PARALLEL_MODE == "root_split":
+            return Root_Split_Search(game_state, validMoves, time_limit_ms, workers, progress=progress)
+        return Parallel_Search(game_state, validMoves, time_limit_ms, workers, progress=progress)
+    return Iterative_Deepening(game_state, validMoves, time_limit_ms, report=progress)
+
 '''
 Helper method for NegaMax with Alpha-Beta pruning implementation  for Chess AI
 its purpose is to call the initial recursive call to FindMove_NegaMax_AB_Pruning() and return results
+The search is given time_limit_ms per move, or a share of the clock when time_left_ms (and increment_ms) are given.
+With stream_progress the queue gets ("info", progress record) after every finished iteration (see Progress_Message())
+and ("bestmove", move) at the end instead of just the move
 '''
-def FindBestMove_NegaMax_AB_Pruning(game_state, validMoves, return_queue):
-    global next_move, counter
+def FindBestMove_NegaMax_AB_Pruning(game_state, validMoves, return_queue, time_limit_ms=TIME_LIMIT_MS, time_left_ms=None, increment_ms=0, workers=None, stream_progress=False):
+    if not stream_progress:
+        return_queue.put(Find_Best_Move(game_state, validMoves, time_limit_ms, time_left_ms, increment_ms, workers))
+        return
+    move = Find_Best_Move(game_state, validMoves, time_limit_ms, time_left_ms, increment_ms, workers,
+                          progress=lambda record: return_queue.put(("info", Progress_Message(record))))
+    return_queue.put(("bestmove", move))
+
+'''
+Progress record of an iteration with the best move in coordinate notation, plain data for sending to another process
+'''
+def Progress_Message(record):
+    return dict(record, move=record["move"].GetUCI() if record["move"] is not None else None)
+
+'''
+Book move or search result of the position, the part of FindBestMove_NegaMax_AB_Pruning() which can also run in a
+process kept for the whole game (ChessAIWorker)
+'''
+def Find_Best_Move(game_state, validMoves, time_limit_ms=TIME_LIMIT_MS, time_left_ms=None, increment_ms=0, workers=None, progress=None):
+    global next_move, counter, q_counter, lazy_eval_skips, full_evaluations
+    workers = WORKERS if workers is None else workers # the setting at the time of the search
     next_move = None # default
     counter = 0
+    q_counter = 0
+    lazy_eval_skips = 0
+    full_evaluations = 0
+    transposition_table.NewSearch()
+    pawn_hash_table.ResetStats()
+    eval_cache.ResetStats()
+    if time_left_ms is not None:
+        time_limit_ms = AllocateTime(time_left_ms, increment_ms)
 
     # Get the book reader and load the database(reuses it if already opened)
     book = get_book()
 
-    # converting GameState to chess.Board()
-    fen = game_state.game_state_to_fen()
-    board = chess.Board(fen)
-
-    # checking the opening book
+    # checking the opening book, our position key is the Polyglot key of the position so no conversion is needed
     try:
-        entries = list(book.find_all(board))
-        if entries:
+        entries = list(book.find_all(game_state.position_key))
+        # book moves are matched against our valid moves, which also leaves out illegal entries (key collisions)
+        book_moves = [(entry, chess_pack_move_to_Move_class(entry.move, validMoves)) for entry in entries]
+        book_moves = [(entry, move) for entry, move in book_moves if move is not None]
+        if book_moves:
                 # selecting a move weighted by frequency
-                # moves = [entry.move for entry in entries] # selecting a move
-                # weights = [entry.weight for entry in entries] # selecting weights of the move
-                # selected_move = random.choices(moves, weights=weights, k=1)[0] # for random book moves by selecting a move by weighted frequency
-            selected_move = max(entries, key = lambda e: e.weight).move # For deterministic moves
-            next_move = chess_pack_move_to_Move_class(selected_move, game_state, board)
-            print(f"Book move: {board.san(selected_move)}")
+                # moves = [move for entry, move in book_moves] # selecting a move
+                # weights = [entry.weight for entry, move in book_moves] # selecting weights of the move
+                # next_move = random.choices(moves, weights=weights, k=1)[0] # for random book moves by selecting a move by weighted frequency
+            next_move = max(book_moves, key = lambda book_move: book_move[0].weight)[1] # For deterministic moves
+            print(f"Book move: {next_move}")
         else:
             # No book entries found, proceed with NegaMax with Alpha-Beta pruning
-            NegaMax_AB_Pruning(game_state, validMoves, DEPTH, -CHECKMATE, CHECKMATE, 1 if game_state.whiteToMove else -1,previous_move=None)
-            print(f"Position's seen by NegaMax AB Pruning Algorithm: {counter}")
+            next_move = Search_Position(game_state, validMoves, time_limit_ms, workers, progress)
+            Print_Search_Stats(workers)
     except KeyError:
         # Position not in book, proceeding with search
-        NegaMax_AB_Pruning(game_state, validMoves, DEPTH, -CHECKMATE, CHECKMATE, 1 if game_state.whiteToMove else -1,previous_move=None)
-        # in the above function call -CHECKMATE is the alpha value and CHECKMATE is the beta value
-        print(f"Position's seen by NegaMax AB Pruning Algorithm: {counter}")
-    return_queue.put(next_move)
+        next_move = Search_Position(game_state, validMoves, time_limit_ms, workers, progress)
+        Print_Search_Stats(workers)
+    return next_move
+
+'''
+Counters of the search in this process. The parallel searches print their own summary instead: the root split search
+runs no search here and the Lazy SMP main search uses the shared table
+'''
+def Print_Search_Stats(workers):
+    if workers <= 1:
+        print(f"Position's seen by NegaMax AB Pruning Algorithm: {counter} (+{q_counter} quiescence), {transposition_table.Stats()}, {pawn_hash_table.Stats()}, {eval_cache.Stats()}, {Lazy_Eval_Stats()}")
 
 ############################################################################################################
 
 '''
 Move Ordering function to improve move searching and evaluation for Engine Optimization
 '''
-def Move_Ordering(game_state, validMoves, depth, previous_move=None):
+def Move_Ordering(game_state, validMoves, depth, previous_move=None, tt_move=0, pv_move=None):
+    pv_move_id = pv_move.moveID if pv_move is not None else 0
+    killers = killer_moves[depth] if 0 <= depth < len(killer_moves) else ()
+    counter_move = counter_moves.get(previous_move.moveID) if previous_move is not None else None
+
     def move_score(move):
         score = 0
+        move_id = move.moveID
+
+        # The previous iteration's principal variation move, then the transposition table move are searched first
+        if move_id == pv_move_id:
+            return float("inf")
+        if move_id == tt_move:
+            return 1e9
 
         # Captures using MVV-LVA heuristic (Most Valuable Victim - Least Valuable Attacker)
         if move.IsCaptured:
             victim_value = pieceScore[move.pieceCaptured[1]] # e.g., 'P' from 'wP'
             attacker_value = pieceScore[move.pieceMoved[1]]
-            score += 100 + (victim_value * 10 - attacker_value)
+            score += victim_value * 10 - attacker_value
+            # captures losing material (by Static Exchange Evaluation) don't get the capture bonus,
+            # which puts them after the killer and counter moves
+            if not Is_Losing_Capture(game_state, move):
+                score += 100
 
         # Bonus for advancing to promotion rank
         if (move.pieceMoved[1] == 'P' and
@@ -378,19 +891,15 @@ def Move_Ordering(game_state, validMoves, depth, previous_move=None):
                 score += 91
 
         # Killer Moves: boost if move is a killer at this depth
-        if 0 <= depth < len(killer_moves) and move in killer_moves[depth]:
+        if move_id in killers:
             score += 80 # Killer move bonus
 
         # Counter Moves: boost if move counters the opponent's last move
-        if previous_move is not None:
-            opponent_move_id = (previous_move.startRow, previous_move.startCol,
-                                    previous_move.endRow, previous_move.endCol)
-            counter_move = counter_moves.get(opponent_move_id)
-            if counter_move is not None and move == counter_move:
-                score += 70
+        if move_id == counter_move:
+            score += 70
 
         # Checks: encouraging forcing moves
-        if move.in_check:
+        if game_state.GivesCheck(move):
             score += 60
 
         # Ordering quiet moves to prioritize moves that improve the piece's position marginally
@@ -400,8 +909,6 @@ def Move_Ordering(game_state, validMoves, depth, previous_move=None):
             score += (end_score - start_score) # Adjusted scaling
 
         # History heuristics: add score is available and stored
-        promoted_to = move.Pawn_Promoted_to if move.PawnPromotion else None
-        move_id = (move.startRow, move.startCol, move.endRow, move.endCol, promoted_to)
         if move_id in history_table:
             score += history_table[move_id]
 
@@ -410,26 +917,50 @@ def Move_Ordering(game_state, validMoves, depth, previous_move=None):
     # Sorting moves in descending order (highest score first)
     return sorted(validMoves, key=move_score, reverse=True)
 
+'''
+A capture by a piece worth more than the captured one can lose material, the Static Exchange Evaluation decides
+'''
+def Is_Losing_Capture(game_state, move):
+    return pieceScore[move.pieceMoved[1]] > pieceScore[move.pieceCaptured[1]] and \
+        game_state.StaticExchangeEvaluation(move, pieceScore) < 0
+
 '''
 Quiescence Search implementation to improve performance
 Def: Quiescence search extends the evaluation beyond the main search depth in dynamic positions 
 (e.g., during capture sequences or checks) to avoid the “horizon effect”—where a critical move is missed just past the depth limit.
 It ensures the evaluation is stable by continuing until a “quiet” position is reached.
 '''
-def Quiescence_Search(game_state, alpha, beta, turn_multiplier, max_depth=2):
+def Quiescence_Search(game_state, alpha, beta, turn_multiplier, max_depth=2, ply=0):
+    global q_counter
+    q_counter += 1
+    # window of the evaluation from White's point of view, like the scores BoardScore() returns
+    eval_alpha, eval_beta = (alpha, beta) if turn_multiplier == 1 else (-beta, -alpha)
     if max_depth == 0:
-        return turn_multiplier * BoardScore(game_state)
+        return turn_multiplier * BoardScore(game_state, eval_alpha, eval_beta)
+
+    # Transposition table lookup, quiescence results are stored with depth <= 0 so any main search result can be used
+    q_depth = max_depth - Q_SEARCH_DEPTH
+    tt_move = 0
+    tt_entry = transposition_table.Probe(game_state.position_key, ply)
+    if tt_entry is not None:
+        tt_depth, tt_score, tt_flag, tt_move = tt_entry
+        if tt_depth >= q_depth:
+            if tt_flag == EXACT or (tt_flag == LOWER_BOUND and tt_score >= beta) or \
+                    (tt_flag == UPPER_BOUND and tt_score <= alpha):
+                return max(alpha, min(beta, tt_score)) # keeping the result inside the window like the search below
 
     # Stand Pat: evaluate the position without making a move
-    stand_pat = turn_multiplier * BoardScore(game_state)
+    stand_pat = turn_multiplier * BoardScore(game_state, eval_alpha, eval_beta)
     if stand_pat >= beta:
         return beta
+    original_alpha = alpha
     if alpha < stand_pat:
         alpha = stand_pat
 
     # Only consider capture and promotion moves (can be improved, but we are just keeping these considerations for now)
     capture_promotion_moves = [move for move in game_state.GetValidMoves() if move.IsCaptured or move.PawnPromotion]
-    Ordered_Moves = Move_Ordering(game_state, capture_promotion_moves, depth = 2) # Setting depth for quiescence search
+    Ordered_Moves = Move_Ordering(game_state, capture_promotion_moves, depth = 2, tt_move=tt_move) # Setting depth for quiescence search
+    best_move = 0
 
     for move in Ordered_Moves:
         # Delta Pruning: skip moves that can't improve alpha value
@@ -440,42 +971,47 @@ def Quiescence_Search(game_state, alpha, beta, turn_multiplier, max_depth=2):
         else:
             gain = 0
 
-        if stand_pat + gain < alpha and not move.in_check: # Skipping non-check moves that don't improve alpha
+        if stand_pat + gain < alpha and not game_state.GivesCheck(move): # Skipping non-check moves that don't improve alpha
             continue
 
-        game_state.MakeMove(move)
-        if game_state.Checkmate: # checkmate found
-            game_state.UndoMove()
-            return turn_multiplier * CHECKMATE if game_state.whiteToMove else -turn_multiplier * CHECKMATE
-        score = -Quiescence_Search(game_state, -beta, -alpha, -turn_multiplier, max_depth - 1)
-        game_state.UndoMove()
+        # SEE Pruning: skipping captures which lose material once the exchange on the square is played out
+        if move.IsCaptured and Is_Losing_Capture(game_state, move):
+            continue
+
+        game_state.MakeMove(move, search=True)
+        if game_state.inCheck() and not game_state.GetValidMoves(): # checkmate found
+            game_state.UndoMove(search=True)
+            return CHECKMATE - ply # same mate distance scoring as NegaMax_AB_Pruning
+        score = -Quiescence_Search(game_state, -beta, -alpha, -turn_multiplier, max_depth - 1, ply + 1)
+        game_state.UndoMove(search=True)
 
         if score >= beta:
+            transposition_table.Store(game_state.position_key, q_depth, beta, LOWER_BOUND, move.moveID, ply)
             return beta
         if score > alpha:
             alpha = score
+            best_move = move.moveID
 
+    transposition_table.Store(game_state.position_key, q_depth, alpha, EXACT if alpha > original_alpha else UPPER_BOUND,
+                              best_move, ply)
     return alpha
 
 ############################################################################################################
 
 '''
 Board Evaluation Function (Positive Score -> Good for White, Negative Score -> Good for Black)
+alpha, beta -> window of the caller (from White's point of view), once the cheap terms put the score more than margin
+outside of it the expensive terms can't bring it back and the cheap score is returned (Lazy Evaluation)
 '''
-def BoardScore(game_state):
+def BoardScore(game_state, alpha=-float("inf"), beta=float("inf"), margin=LAZY_EVAL_MARGIN):
+    global lazy_eval_skips, full_evaluations
     if game_state.Checkmate:
         if game_state.whiteToMove:
             return -CHECKMATE # black wins
         else:
             return CHECKMATE # white wins
     elif game_state.Stalemate: # Penalising stalemate positions
-        material_score = 0
-        for row in range(len(game_state.board_array)):
-            for col in range(len(game_state.board_array[row])):
-                square = game_state.board_array[row, col]
-                if square != '--':
-                    piece_value = pieceScore[square[1]]
-                    material_score += piece_value if square[0] == 'w' else -piece_value
+        material_score = game_state.bitboards.material["w"] - game_state.bitboards.material["b"]
         # Penalising stalemate if the side to move has material advantage
         if game_state.whiteToMove and material_score > 35:
             return -50 # discouraging stalemate for White
@@ -483,28 +1019,37 @@ def BoardScore(game_state):
             return 50 # discouraging stalemate for Black
         return STALEMATE # neither side wins
 
-    # Based on pure captures and board material
-    score = 0
-    for row in range(len(game_state.board_array)):
-        for col in range(len(game_state.board_array[row])):
-            square = game_state.board_array[row, col]
-            if square != "--":
-                # Scoring positionally based on  piece
-                if square[1] == "P": # For pawns
-                    piece_position_score = Piece_Influence_Scores[square][row, col]
-                else: # For other pieces
-                    piece_position_score = Piece_Influence_Scores[square[1]][row, col]
-
-                if square[0] == 'w':
-                    score += pieceScore[square[1]] + piece_position_score
-                elif square[0] == 'b':
-                    score -= pieceScore[square[1]] + piece_position_score
+    # Based on pure captures and board material plus the positional (influence) score of every piece, all the totals
+    # are kept up to date by GameState on every move so nothing has to be scanned here. The middlegame and endgame
+    # influence scores are blended by the game phase (MAX_PHASE -> middlegame only, 0 -> endgame only)
+    bitboards = game_state.bitboards
+    # Positions evaluated before (only full evaluations are stored, so the cached score is always exact)
+    cached_score = eval_cache.Probe(bitboards.piece_hash)
+    if cached_score is not None:
+        return cached_score
+    phase = min(bitboards.phase, MAX_PHASE)
+    middlegame = bitboards.piece_square["w"] - bitboards.piece_square["b"]
+    endgame = bitboards.piece_square_endgame["w"] - bitboards.piece_square_endgame["b"]
+    score = bitboards.material["w"] - bitboards.material["b"] + (middlegame * phase + endgame * (MAX_PHASE - phase)) // MAX_PHASE
+
+    # The pawn structure score is usually a pawn hash hit, so it is counted with the cheap terms
+    pawn_entry = Probe_Pawn_Entry(bitboards)
+    score += pawn_entry[0]
+    if USE_LAZY_EVAL and (score - margin >= beta or score + margin <= alpha):
+        lazy_eval_skips += 1
+        return score
+    full_evaluations += 1
 
     # Additional advanced evaluation function for evaluating the piece (only to be used if host machine is powerful to run
     # as it will be computationally heavier than the simple evaluation
-    score += Piece_Coordination_Evaluation(game_state)
+    score += Piece_Coordination_Evaluation(game_state, pawn_entry) - pawn_entry[0]
+    eval_cache.Store(bitboards.piece_hash, score)
     return score
 
+def Lazy_Eval_Stats():
+    evaluations = lazy_eval_skips + full_evaluations
+    return f"Lazy eval skips: {lazy_eval_skips} of {evaluations} ({lazy_eval_skips / evaluations * 100 if evaluations else 0:.1f}%)"
+
 ############################################################################################################
 
 '''
@@ -537,9 +1082,10 @@ def get_book():
 
 '''
 The opening book returns moves in python-chess’s format,
-which we need to convert to our Move class.
+which we need to convert to our Move class by finding the same move in the valid moves.
+Polyglot stores castling as the king capturing its own rook (e1h1), which is mapped to our castle move (e1g1)
 '''
-def chess_pack_move_to_Move_class(chess_move, game_state, board):
+def chess_pack_move_to_Move_class(chess_move, validMoves):
     start_square = chess_move.from_square
     end_square = chess_move.to_square
     # Converting to our implementation of  row indexing (row 0 = rank 8, row 7 =rank 1)
@@ -548,32 +1094,132 @@ def chess_pack_move_to_Move_class(chess_move, game_state, board):
     end_row = 7 - (end_square // 8)
     end_col = end_square % 8
     promotion = chess.piece_symbol(chess_move.promotion).upper() if chess_move.promotion else None
-    is_castle = board.is_castling(chess_move)
-    is_en_passant = board.is_en_passant(chess_move)
-    return Move((start_row, start_col), (end_row, end_col), game_state.board_array,EnPassant= is_en_passant, IsCastleMove= is_castle, Promotion_Piece=promotion)
+    for move in validMoves:
+        if move.startRow == start_row and move.startCol == start_col and move.endRow == end_row:
+            move_end_col = (7 if move.endCol == 6 else 0) if move.IsCastleMove else move.endCol # rook's square for castling
+            if move_end_col == end_col and move.Pawn_Promoted_to == promotion:
+                return move
+    return None
 
 ############################################################################################################
 '''
 Function which checks multiple board position concepts and piece coordination concepts for advanced evaluation 
 which will be used by BoardScore() function to evaluate the board and provide the correct move to be done
 '''
-def Piece_Coordination_Evaluation(game_state):
+def Piece_Coordination_Evaluation(game_state, pawn_entry=None):
     """
     This function evaluates the co-ordination concepts of the pieces mentioned below.
+    All of them are computed in one pass over the piece bitboards by Coordination_Terms(), the function of each concept
+    further down is kept as the reference the terms are checked against when GameState's debug_evaluation is on.
     """
-    piece_coord_score = 0
+    terms = Coordination_Terms(game_state, pawn_entry)
+    if game_state.debug_evaluation:
+        Check_Coordination_Terms(game_state, terms)
+    return sum(terms)
 
-    # Now we evaluate the various positions on the board by calling functions of each coordination and evaluation concept
-    piece_coord_score += Pawn_Structure_Evaluation(game_state)
-    piece_coord_score += King_Safety_Check(game_state)
-    piece_coord_score += Bishop_Pair_Bonus(game_state)
-    piece_coord_score += Rooks_On_Open_File(game_state)
-    piece_coord_score += Connected_Rooks(game_state)
-    piece_coord_score += Knight_Outposts(game_state)
-    piece_coord_score += Queen_And_Minor_Piece_Co_ordination(game_state)
-    piece_coord_score += Pawn_Support(game_state)
+def Coordination_Terms(game_state, pawn_entry=None):
+    """
+    Returns the score of every coordination concept, in the order of Coordination_Reference_Functions(), using the
+    bitboards (the piece lists of the position) and the pawn file masks instead of scanning board_array once per concept.
+    Each term gives exactly the same value as its reference function. pawn_entry is the position's pawn hash entry
+    when the caller already has it.
+    """
+    bitboards = game_state.bitboards
+    pieces = bitboards.pieces
+    occupancy = bitboards.occupancy
+    occupied = occupancy["w"] | occupancy["b"]
+    white_pawns, black_pawns = pieces["wP"], pieces["bP"]
+
+    # Everything depending on the pawns alone comes from the pawn hash table
+    if pawn_entry is None:
+        pawn_entry = Probe_Pawn_Entry(bitboards)
+    pawn_structure, open_files, white_knight_threats, black_knight_threats, white_pawn_attacks, black_pawn_attacks = pawn_entry
+
+    # King safety: pawns in front of a king still on its back rank, skipped in the endgame
+    king_safety = 0
+    if bitboards.phase >= KING_SAFETY_PHASE:
+        white_king = pieces["wK"]
+        if white_king & ROW_MASKS[7]:
+            king_safety -= (3 - PopCount(KING_ATTACKS[white_king.bit_length() - 1] & ROW_MASKS[6] & white_pawns)) * 10
+        black_king = pieces["bK"]
+        if black_king & ROW_MASKS[0]:
+            king_safety += (3 - PopCount(KING_ATTACKS[black_king.bit_length() - 1] & ROW_MASKS[1] & black_pawns)) * 10
+
+    bishop_pair = (50 if PopCount(pieces["wB"]) == 2 else 0) - (50 if PopCount(pieces["bB"]) == 2 else 0)
+
+    # Rooks on files without pawns, and rooks of the same color seeing each other along a rank or file
+    rooks_open_file = connected_rooks = 0
+    for color, sign in (("w", 1), ("b", -1)):
+        rooks = list(IterateSquares(pieces[color + "R"]))
+        for index, square in enumerate(rooks):
+            if open_files >> square & 1:
+                rooks_open_file += 10 * sign
+            for other in rooks[index + 1:]:
+                if RookAttacks(square, occupied) & (1 << other):
+                    connected_rooks += 15 * sign
+
+    # Knight outposts: knights on their outpost ranks which none of the squares in the pawn entry threaten
+    knight_outposts = 10 * (PopCount(pieces["wN"] & (ROW_MASKS[2] | ROW_MASKS[3] | ROW_MASKS[4]) & ~white_knight_threats)
+                            - PopCount(pieces["bN"] & (ROW_MASKS[3] | ROW_MASKS[4] | ROW_MASKS[5]) & ~black_knight_threats))
+
+    # The reference function compares a piece letter against color + letter, its minor piece list is always empty
+    queen_minor_coordination = 0
+
+    # Pawn support: every piece other than a pawn standing on a square its own pawns attack
+    pawn_support = 5 * (PopCount(white_pawn_attacks & (occupancy["w"] ^ white_pawns))
+                        - PopCount(black_pawn_attacks & (occupancy["b"] ^ black_pawns)))
+
+    return (pawn_structure, king_safety, bishop_pair, rooks_open_file, connected_rooks, knight_outposts,
+            queen_minor_coordination, pawn_support)
+
+def Probe_Pawn_Entry(bitboards):
+    """
+    Pawn hash entry of the position, evaluated and stored on a miss
+    """
+    pawn_entry = pawn_hash_table.Probe(bitboards.pawn_hash)
+    if pawn_entry is None:
+        pawn_entry = Pawn_Structure_Entry(bitboards.pieces["wP"], bitboards.pieces["bP"])
+        pawn_hash_table.Store(bitboards.pawn_hash, pawn_entry)
+    return pawn_entry
 
-    return piece_coord_score
+def Pawn_Structure_Entry(white_pawns, black_pawns):
+    """
+    Evaluates the parts of Coordination_Terms() which only depend on the pawns, stored in the pawn hash table as
+    (pawn structure score, open files, squares where a white knight is no outpost, squares where a black knight is
+    no outpost, squares attacked by white pawns, squares attacked by black pawns)
+    """
+    # Pawn structure: the reference passed pawn scan covers every row for white pawns, the pawn's own square included,
+    # so a white pawn is never passed, and an empty range of rows for black pawns, so every black pawn is passed.
+    # The reference has no isolated pawn term
+    pawn_structure = -50 * PopCount(black_pawns)
+    white_pawn_files = black_pawn_files = 0
+    for square in IterateSquares(white_pawns):
+        white_pawn_files |= FILE_MASKS[square & 7]
+    for square in IterateSquares(black_pawns):
+        black_pawn_files |= FILE_MASKS[square & 7]
+    # doubled pawns: every pawn beyond the first on a file
+    pawn_structure -= 20 * (PopCount(white_pawns) - PopCount(white_pawn_files & ROW_MASKS[0]))
+    pawn_structure += 20 * (PopCount(black_pawns) - PopCount(black_pawn_files & ROW_MASKS[0]))
+    open_files = ~(white_pawn_files | black_pawn_files) & FULL_BOARD
+    # The reference outpost check looks for enemy pawns on the squares the knight's own pawns would defend it from,
+    # the knight squares seen by those pawns are where the enemy pawns attack in the knight's own pawns' direction
+    white_knight_threats = PawnAttacks(black_pawns, "w")
+    black_knight_threats = PawnAttacks(white_pawns, "b")
+    return (pawn_structure, open_files, white_knight_threats, black_knight_threats,
+            PawnAttacks(white_pawns, "w"), PawnAttacks(black_pawns, "b"))
+
+def Coordination_Reference_Functions():
+    return (Pawn_Structure_Evaluation, King_Safety_Check, Bishop_Pair_Bonus, Rooks_On_Open_File, Connected_Rooks,
+            Knight_Outposts, Queen_And_Minor_Piece_Co_ordination, Pawn_Support)
+
+def Check_Coordination_Terms(game_state, terms):
+    """
+    Debug check of the single pass terms against the board_array scan of each reference function
+    """
+    for term, reference in zip(terms, Coordination_Reference_Functions()):
+        expected = reference(game_state)
+        if term != expected:
+            raise RuntimeError(f"{reference.__name__} gives {expected} but Coordination_Terms() gives {term}")
 
 ############################################################################################################
 '''
@@ -614,7 +1260,10 @@ def Pawn_Structure_Evaluation(game_state):
 def King_Safety_Check(game_state):
     #  A king under check is a major disadvantage therefore,
     # we check for pawn shields( pawns in front of the king) and penalise the absense based on the number of pawns
+    # In the endgame the king has to become active instead, so the shield is not checked at all
     safety_score = 0
+    if game_state.bitboards.phase < KING_SAFETY_PHASE:
+        return safety_score
     for color, row in [("w", 7), ("b", 0)]:  # kings on back rank
         king_col = None
         for col in range(8):
@@ -0,0 +1,225 @@
+""" The AI as a process kept for the whole game. ChessMain starts it once through EngineProcess() and sends it short
+text commands over a Pipe instead of starting a new process (and pickling the whole GameState) for every AI move, so
+the tables the search builds (transposition table, killer moves, history and counter moves) stay warm between moves.
+Commands:
+    position startpos [moves <move> ...]   the game from the standard starting position, or
+    position fen <fen> [moves <move> ...]  from a FEN, moves in coordinate notation (e2e4, e7e8q)
+    go [ponder] [movetime <ms>]            searches the position, sending ("info", search number, progress record)
+                                           after every finished iteration and ("bestmove", search number, move,
+                                           expected reply) at the end
+    setoption name <name> value <value>    search settings: Workers (ChessAI.WORKERS) and ParallelMode
+                                           (ChessAI.PARALLEL_MODE, lazy_smp or root_split)
+    quit
+A search is stopped by the stop value shared with the process rather than a command, as the process doesn't read the
+pipe while it searches. For the same reason a ponder hit is a shared value too.
+Pondering: after its move the AI searches the position after the reply its principal variation expects, without a time
+limit, while the human thinks. If the human plays that reply (a ponder hit) the search goes on as the real search, with
+movetime less the time it already pondered (see ChessAI.Set_Search_Time()), otherwise it is stopped and the real
+position searched, still with the transposition table the ponder search filled"""
+import multiprocessing
+import atexit
+import time
+import ChessEngine, ChessAI
+
+'''
+Stop flag of one search, polled by ChessAI through is_set(): searches are numbered in the order of the go commands
+and a search is stopped once the shared stop value reaches its number, so stopping never affects a later search.
+A ponder search (ponderhit_value given) also watches for its ponder hit the same way, which starts its clock with the
+time already pondered taken off
+'''
+class SearchStop:
+    def __init__(self, stop_value, search_id, ponderhit_value=None, time_limit_ms=None):
+        self.stop_value = stop_value
+        self.search_id = search_id
+        self.ponderhit_value = ponderhit_value
+        self.time_limit_ms = time_limit_ms
+        self.ponder_hit = False
+        self.start_time = time.perf_counter()
+
+    def is_set(self):
+        if self.ponderhit_value is not None and not self.ponder_hit and self.ponderhit_value.value >= self.search_id:
+            self.ponder_hit = True
+            ChessAI.Set_Search_Time(self.time_limit_ms, (time.perf_counter() - self.start_time) * 1000)
+        return self.stop_value.value >= self.search_id
+
+'''
+Main loop of the engine process
+'''
+def Engine_Loop(connection, stop_value, ponderhit_value):
+    game_state = ChessEngine.GameState()
+    position = (None, []) # (FEN or None for the starting position, moves) game_state is at
+    search_id = 0
+    while True:
+        try:
+            command = connection.recv().split()
+        except EOFError: # ChessMain is gone without sending quit
+            break
+        if not command:
+            continue
+        if command[0] == "position":
+            game_state, position = Set_Position(game_state, position, command[1:])
+        elif command[0] == "go":
+            search_id += 1
+            time_limit_ms = int(command[command.index("movetime") + 1]) if "movetime" in command else ChessAI.TIME_LIMIT_MS
+            pondering = "ponder" in command
+            stop = SearchStop(stop_value, search_id, ponderhit_value if pondering else None, time_limit_ms)
+            ChessAI.stop_event = stop
+            validMoves = game_state.GetValidMoves()
+            progress = lambda record, search_id=search_id: connection.send(("info", search_id, ChessAI.Progress_Message(record)))
+            move = ChessAI.Find_Best_Move(game_state, validMoves, float("inf") if pondering else time_limit_ms,
+                                          progress=progress) if validMoves else None
+            # a ponder search which ended by itself (book move, mate found) answers only after the hit or the stop
+            while pondering and not stop.is_set() and not stop.ponder_hit:
+                time.sleep(0.005)
+            ChessAI.stop_event = None
+            # reply expected by the principal variation, the move to ponder on next
+            pv = ChessAI.previous_pv
+            ponder_move = pv[1].GetUCI() if move is not None and len(pv) > 1 and pv[0] == move else None
+            connection.send(("bestmove", search_id, move.GetUCI() if move is not None else None, ponder_move))
+        elif command[0] == "setoption":
+            Set_Option(command[1:])
+        elif command[0] == "quit":
+            break
+    # a process started by multiprocessing doesn't run the exit handlers
+    ChessAI.Close_Lazy_SMP_Helpers()
+    ChessAI.Close_Root_Split_Pool()
+
+'''
+Changes a search setting of a setoption command, used from the next search on
+'''
+def Set_Option(arguments):
+    name = " ".join(arguments[1:arguments.index("value")])
+    value = " ".join(arguments[arguments.index("value") + 1:])
+    if name == "Workers":
+        ChessAI.WORKERS = max(1, int(value))
+    elif name == "ParallelMode":
+        if value not in ("lazy_smp", "root_split"):
+            raise ValueError(f"Unknown parallel mode {value}")
+        ChessAI.PARALLEL_MODE = value
+    else:
+        raise ValueError(f"Unknown option {name}")
+
+'''
+Brings game_state to the position of a position command. When the FEN is the same only the moves that differ are
+undone and made, the usual case being one or two moves more than the last position
+'''
+def Set_Position(game_state, position, arguments):
+    fen_fields = arguments[1:arguments.index("moves")] if "moves" in arguments else arguments[1:]
+    fen = " ".join(fen_fields) if arguments[0] == "fen" else None
+    moves = arguments[arguments.index("moves") + 1:] if "moves" in arguments else []
+    current_fen, current_moves = position
+    if fen != current_fen:
+        game_state = ChessEngine.GameState()
+        if fen is not None:
+            game_state.LoadFEN(fen)
+        current_moves = []
+    common = 0
+    while common < min(len(moves), len(current_moves)) and moves[common] == current_moves[common]:
+        common += 1
+    for _ in range(len(current_moves) - common):
+        game_state.UndoMove()
+    for text in moves[common:]:
+        move = game_state.ParseMove(text)
+        if move is None:
+            raise ValueError(f"Illegal move {text} in position command")
+        game_state.MakeMove(move)
+    return game_state, (fen, moves)
+
+'''
+ChessMain's side of the engine process
+'''
+class EngineProcess:
+    def __init__(self):
+        self.connection, engine_connection = multiprocessing.Pipe()
+        self.stop_value = multiprocessing.RawValue("i", 0) # number of the last search to stop
+        self.ponderhit_value = multiprocessing.RawValue("i", 0) # number of the last ponder search that got its hit
+        self.search_id = 0 # number of the last go command sent
+        self.info = None # last progress record of that search (see ChessAI.Iterative_Deepening()), None before the first
+        self.ponder_move = None # reply expected by the last search answered
+        self.ponder_position = None # position command of the running ponder search, None when not pondering
+        # not a daemon process, as those can't start the processes of the parallel searches (ChessAI.WORKERS > 1).
+        # Quit() ends it, also when the program exits
+        self.process = multiprocessing.Process(target=Engine_Loop, args=(engine_connection, self.stop_value, self.ponderhit_value))
+        self.process.start()
+        atexit.register(self.Quit)
+
+    '''
+    Position command of the game: its starting position and every move played since, plus extra_moves
+    '''
+    def PositionCommand(self, game_state, extra_moves=()):
+        start = "startpos" if game_state.start_fen is None else "fen " + game_state.start_fen
+        moves = " ".join([move.GetUCI() for move in game_state.moveLog] + list(extra_moves))
+        return f"position {start} moves {moves}" if moves else f"position {start}"
+
+    def SetPosition(self, game_state):
+        self.connection.send(self.PositionCommand(game_state))
+
+    def SetOption(self, name, value):
+        self.connection.send(f"setoption name {name} value {value}")
+
+    def Go(self, time_limit_ms, ponder=False):
+        self.search_id += 1
+        self.info = None
+        self.connection.send(f"go ponder movetime {int(time_limit_ms)}" if ponder else f"go movetime {int(time_limit_ms)}")
+
+    '''
+    Searches the game position for time_limit_ms. When it is the position being pondered the ponder search just carries
+    on, with the time limit given to Ponder() less the time it pondered, otherwise pondering is stopped first
+    '''
+    def Search(self, game_state, time_limit_ms):
+        if self.ponder_position is not None and self.PositionCommand(game_state) == self.ponder_position:
+            self.ponderhit_value.value = self.search_id # ponder hit, its answer is the answer of this search
+            self.ponder_position = None
+            return
+        self.Stop()
+        self.SetPosition(game_state)
+        self.Go(time_limit_ms)
+
+    '''
+    Ponders on the reply the last search expects (if any) in the game position after the AI's move. time_limit_ms is
+    the time the search gets after a ponder hit
+    '''
+    def Ponder(self, game_state, time_limit_ms):
+        if self.ponder_move is None:
+            return
+        self.ponder_position = self.PositionCommand(game_state, [self.ponder_move])
+        self.connection.send(self.ponder_position)
+        self.Go(time_limit_ms, ponder=True)
+
+    '''
+    Stops the running search (and any sent before it), the search still answers with the best move it has
+    '''
+    def Stop(self):
+        self.stop_value.value = self.search_id
+        self.ponder_position = None
+
+    '''
+    Answer of the last go command without waiting: (True, move text or None) once it is there, (False, None) before.
+    Progress records on the way are kept in info, messages of older searches are dropped
+    '''
+    def Poll(self):
+        while self.connection.poll():
+            message = self.connection.recv()
+            kind, search_id = message[:2]
+            if search_id != self.search_id or self.ponder_position is not None: # older search, or still pondering
+                continue
+            if kind == "info":
+                self.info = message[2]
+            else:
+                self.ponder_move = message[3]
+                return True, message[2]
+        return False, None
+
+    def IsAlive(self):
+        return self.process.is_alive()
+
+    def Quit(self):
+        atexit.unregister(self.Quit)
+        self.Stop()
+        try:
+            self.connection.send("quit")
+        except OSError: # the process is already gone
+            pass
+        self.process.join(timeout=3) # time to close the processes of a parallel search too
+        if self.process.is_alive():
+            self.process.terminate()
@@ -0,0 +1,77 @@
+""" Attack tables precomputed once at import time for every square of the board, so that move generation only has to
+look up the squares a piece attacks instead of walking offsets and rays with bounds checks on every call.
+Squares and bitboards use the same (row * 8 + col) layout as ChessBitboard"""
+from ChessBitboard import KnightAttacks, KingAttacks, PawnAttacks, SlidingAttacks, ROOK_DIRECTIONS, BISHOP_DIRECTIONS, \
+    QUEEN_DIRECTIONS
+
+# Leaper attacks, one bitboard per square
+KNIGHT_ATTACKS = [KnightAttacks(1 << square) for square in range(64)]
+KING_ATTACKS = [KingAttacks(1 << square) for square in range(64)]
+PAWN_ATTACKS = {color: [PawnAttacks(1 << square, color) for square in range(64)] for color in ("w", "b")}
+
+# Rays on an empty board for every direction and square
+RAYS = {direction: [SlidingAttacks(1 << square, 0, (direction,)) for square in range(64)] for direction in QUEEN_DIRECTIONS}
+# moving along a direction increases the square index if the step (row change * 8 + col change) is positive
+INCREASING_DIRECTIONS = {direction: direction[0] * 8 + direction[1] > 0 for direction in QUEEN_DIRECTIONS}
+# Whole line through a square along a direction (both ways), the squares a piece pinned along that direction can use
+LINES = {direction: [RAYS[direction][square] | RAYS[(-direction[0], -direction[1])][square] for square in range(64)]
+         for direction in QUEEN_DIRECTIONS}
+
+'''
+Attacks along one direction, the ray stops at (and includes) the first occupied square. The ray beyond the blocker
+is removed by XOR-ing out the blocker's own ray in the same direction
+'''
+def RayAttacks(square, occupied, direction):
+    attacks = RAYS[direction][square]
+    blockers = attacks & occupied
+    if blockers:
+        if INCREASING_DIRECTIONS[direction]:
+            blocker = (blockers & -blockers).bit_length() - 1  # nearest blocker is the lowest bit
+        else:
+            blocker = blockers.bit_length() - 1  # nearest blocker is the highest bit
+        attacks ^= RAYS[direction][blocker]
+    return attacks
+
+'''
+Sliding attack tables indexed by occupancy (the same idea as magic bitboards, with a dict per square doing the job of
+the magic multiplication). Only the squares on a piece's rays, without the last square of each ray, can change
+its attacks, so the occupancy is masked to those squares before the lookup
+'''
+def RelevantOccupancyMask(square, directions):
+    mask = 0
+    for direction in directions:
+        ray = RAYS[direction][square]
+        if ray:
+            edge = ray.bit_length() - 1 if INCREASING_DIRECTIONS[direction] else (ray & -ray).bit_length() - 1
+            mask |= ray ^ (1 << edge)
+    return mask
+
+def BuildSlidingTable(square, mask, directions):
+    table = {}
+    subset = 0
+    while True:  # going through every subset of the mask (carry-rippler trick)
+        attacks = 0
+        for direction in directions:
+            attacks |= RayAttacks(square, subset, direction)
+        table[subset] = attacks
+        subset = (subset - mask) & mask
+        if subset == 0:
+            break
+    return table
+
+ROOK_MASKS = [RelevantOccupancyMask(square, ROOK_DIRECTIONS) for square in range(64)]
+BISHOP_MASKS = [RelevantOccupancyMask(square, BISHOP_DIRECTIONS) for square in range(64)]
+ROOK_TABLES = [BuildSlidingTable(square, ROOK_MASKS[square], ROOK_DIRECTIONS) for square in range(64)]
+BISHOP_TABLES = [BuildSlidingTable(square, BISHOP_MASKS[square], BISHOP_DIRECTIONS) for square in range(64)]
+
+'''
+Sliding piece attacks for the given board occupancy
+'''
+def RookAttacks(square, occupied):
+    return ROOK_TABLES[square][occupied & ROOK_MASKS[square]]
+
+def BishopAttacks(square, occupied):
+    return BISHOP_TABLES[square][occupied & BISHOP_MASKS[square]]
+
+def QueenAttacks(square, occupied):
+    return ROOK_TABLES[square][occupied & ROOK_MASKS[square]] | BISHOP_TABLES[square][occupied & BISHOP_MASKS[square]]
@@ -0,0 +1,131 @@
+""" Evaluation of many positions at once with NumPy, for scoring whole move lists and for offline analysis of large
+sets of games. Positions are given either as piece planes, an (N, 12, 8, 8) (or (N, 12, 64)) array with one 0/1 plane
+per piece in the order of ChessBitboard.PIECES, or as an (N, 64) array of piece codes (0 for an empty square, else
+1 + the index of the piece in PIECES), squares indexed row * 8 + col like the bitboards.
+BatchEvaluate() gives the same (phase tapered) score as the AI's BoardScore() without the terms which need the rest of the game state
+or ray scans: checkmate and stalemate, and connected rooks"""
+import numpy as np
+from ChessBitboard import PIECES
+from ChessEvaluationTables import pieceScore, PHASE_WEIGHTS, MAX_PHASE, KING_SAFETY_PHASE, Piece_Square_Influence, \
+    Piece_Square_Endgame_Influence
+
+PIECE_CODES = {piece: index + 1 for index, piece in enumerate(PIECES)}
+WHITE_PAWN, WHITE_KNIGHT, WHITE_BISHOP, WHITE_ROOK = 0, 1, 2, 3
+BLACK_PAWN, BLACK_KNIGHT, BLACK_BISHOP, BLACK_ROOK = 6, 7, 8, 9
+WHITE_KING, BLACK_KING = 5, 11
+
+# Material and middlegame and endgame influence of every piece on every square, positive for white and negative for
+# black, shape (12, 64). The phase weight of each piece, shape (12,)
+SIGNS = np.array([1 if piece[0] == "w" else -1 for piece in PIECES], dtype=np.int64)
+MATERIAL_SCORES = np.array([pieceScore[piece[1]] for piece in PIECES], dtype=np.int64) * SIGNS
+MIDDLEGAME_SQUARE_SCORES = np.array([Piece_Square_Influence[piece] for piece in PIECES], dtype=np.int64) * SIGNS[:, None]
+ENDGAME_SQUARE_SCORES = np.array([Piece_Square_Endgame_Influence[piece] for piece in PIECES], dtype=np.int64) * SIGNS[:, None]
+PIECE_PHASES = np.array([PHASE_WEIGHTS[piece[1]] for piece in PIECES], dtype=np.int64)
+
+'''
+Piece planes (N, 12, 64) from lists of the 12 piece bitboards (in PIECES order): the 8 bytes of each bitboard unpacked
+lowest bit first give the squares in bitboard order
+'''
+def BitboardsToPlanes(piece_bitboards):
+    bitboards = np.array(piece_bitboards, dtype="<u8").reshape(-1, len(PIECES))
+    return np.unpackbits(bitboards.view(np.uint8).reshape(len(bitboards), len(PIECES), 8), axis=-1, bitorder="little")
+
+'''
+Piece planes (N, 12, 64) of game states
+'''
+def EncodeGameStates(game_states):
+    return BitboardsToPlanes([[game_state.bitboards.pieces[piece] for piece in PIECES] for game_state in game_states])
+
+'''
+Piece codes (64,) of a board_array, for building (N, 64) arrays of positions
+'''
+def EncodeBoardArray(board_array):
+    return np.array([PIECE_CODES.get(piece, 0) for piece in np.asarray(board_array).ravel()], dtype=np.uint8)
+
+'''
+Piece planes (N, 12, 64) from any of the accepted encodings
+'''
+def ToPiecePlanes(positions):
+    positions = np.asarray(positions)
+    if positions.ndim == 2: # (N, 64) piece codes
+        return (positions[:, None, :] == np.arange(1, len(PIECES) + 1)[None, :, None]).astype(np.uint8)
+    return positions.reshape(len(positions), len(PIECES), 64)
+
+'''
+Marks every square with a pawn of the plane on (row + row_change, col - 1) or (row + row_change, col + 1), for
+all the boards (N, 8, 8) at once
+'''
+def PawnDiagonals(pawns, row_change):
+    marked = np.zeros_like(pawns)
+    if row_change == 1:
+        marked[:, :7, 1:] |= pawns[:, 1:, :7]
+        marked[:, :7, :7] |= pawns[:, 1:, 1:]
+    else:
+        marked[:, 1:, 1:] |= pawns[:, :7, :7]
+        marked[:, 1:, :7] |= pawns[:, :7, 1:]
+    return marked
+
+'''
+Scores of all the positions (positive -> good for White), an int64 array of shape (N,)
+'''
+def BatchEvaluate(positions):
+    planes = ToPiecePlanes(positions)
+    count = len(planes)
+    # Material, phase and piece-square scores of every position as products with the tables
+    flat_planes = planes.reshape(count, -1).astype(np.int64)
+    piece_counts = planes.sum(axis=2, dtype=np.int64)
+    phases = piece_counts @ PIECE_PHASES
+    tapered_phases = np.minimum(phases, MAX_PHASE)
+    middlegame = flat_planes @ MIDDLEGAME_SQUARE_SCORES.ravel()
+    endgame = flat_planes @ ENDGAME_SQUARE_SCORES.ravel()
+    scores = piece_counts @ MATERIAL_SCORES + (middlegame * tapered_phases + endgame * (MAX_PHASE - tapered_phases)) // MAX_PHASE
+
+    boards = planes.reshape(count, len(PIECES), 8, 8).astype(bool)
+    white_pawns, black_pawns = boards[:, WHITE_PAWN], boards[:, BLACK_PAWN]
+    white_pawn_files, black_pawn_files = white_pawns.sum(axis=1), black_pawns.sum(axis=1) # pawns per file (N, 8)
+
+    # Pawn structure, the same as the AI's Pawn_Structure_Entry(): every black pawn counts as passed, doubled pawns
+    scores -= 50 * black_pawn_files.sum(axis=1)
+    scores -= 20 * np.maximum(white_pawn_files - 1, 0).sum(axis=1)
+    scores += 20 * np.maximum(black_pawn_files - 1, 0).sum(axis=1)
+
+    # King safety: pawns on the three squares in front of a king still on its back rank, not in the endgame
+    for king, king_row, pawns, shield_row, sign in ((WHITE_KING, 7, white_pawns, 6, -1), (BLACK_KING, 0, black_pawns, 1, 1)):
+        king_files = boards[:, king, king_row]
+        around_king = king_files.copy()
+        around_king[:, 1:] |= king_files[:, :7]
+        around_king[:, :7] |= king_files[:, 1:]
+        shield = (around_king & pawns[:, shield_row]).sum(axis=1)
+        scores += sign * np.where(king_files.any(axis=1) & (phases >= KING_SAFETY_PHASE), (3 - shield) * 10, 0)
+
+    # Bishop pair
+    scores += 50 * (boards[:, WHITE_BISHOP].sum(axis=(1, 2)) == 2)
+    scores -= 50 * (boards[:, BLACK_BISHOP].sum(axis=(1, 2)) == 2)
+
+    # Rooks on files without pawns
+    open_files = (white_pawn_files + black_pawn_files) == 0
+    scores += 10 * (boards[:, WHITE_ROOK].sum(axis=1) * open_files).sum(axis=1)
+    scores -= 10 * (boards[:, BLACK_ROOK].sum(axis=1) * open_files).sum(axis=1)
+
+    # Knight outposts, with the squares the AI's Knight_Outposts() checks for enemy pawns
+    scores += 10 * (boards[:, WHITE_KNIGHT, 2:5] & ~PawnDiagonals(black_pawns, 1)[:, 2:5]).sum(axis=(1, 2))
+    scores -= 10 * (boards[:, BLACK_KNIGHT, 3:6] & ~PawnDiagonals(white_pawns, -1)[:, 3:6]).sum(axis=(1, 2))
+
+    # Pawn support: pieces other than pawns defended by one of their own pawns
+    white_pieces = boards[:, WHITE_KNIGHT:WHITE_KING + 1].any(axis=1)
+    black_pieces = boards[:, BLACK_KNIGHT:BLACK_KING + 1].any(axis=1)
+    scores += 5 * (white_pieces & PawnDiagonals(white_pawns, 1)).sum(axis=(1, 2))
+    scores -= 5 * (black_pieces & PawnDiagonals(black_pawns, -1)).sum(axis=(1, 2))
+    return scores
+
+'''
+Scores of the positions reached by each of the moves (positive -> good for White), every move is made and undone on
+the game state to read its bitboards and the resulting positions are evaluated together
+'''
+def BatchScoreMoves(game_state, moves):
+    piece_bitboards = []
+    for move in moves:
+        game_state.MakeMove(move, search=True)
+        piece_bitboards.append([game_state.bitboards.pieces[piece] for piece in PIECES])
+        game_state.UndoMove(search=True)
+    return BatchEvaluate(BitboardsToPlanes(piece_bitboards))
@@ -0,0 +1,149 @@
+""" The Bitboards() class keeps a 64-bit integer for every piece type and colour plus the occupancy masks of each side.
+It is kept in sync with GameState.board_array by MakeMove()/UndoMove() and is used by the move generators and the
+board evaluation so that they don't have to walk the 8x8 array square by square"""
+from ChessZobrist import PIECE_KEYS
+from ChessEvaluationTables import pieceScore, PHASE_WEIGHTS, Piece_Square_Influence, Piece_Square_Endgame_Influence
+
+# A square is stored as bit (row * 8 + col), so row 0/col 0 (a8) is bit 0 and row 7/col 7 (h1) is bit 63.
+# This is the same row/col layout as board_array, which keeps converting between the two trivial
+FULL_BOARD = (1 << 64) - 1
+FILE_A = 0x0101010101010101  # every square on col 0
+FILE_B = FILE_A << 1
+FILE_G = FILE_A << 6
+FILE_H = FILE_A << 7
+NOT_FILE_A = FULL_BOARD ^ FILE_A
+NOT_FILE_H = FULL_BOARD ^ FILE_H
+NOT_FILE_AB = FULL_BOARD ^ (FILE_A | FILE_B)
+NOT_FILE_GH = FULL_BOARD ^ (FILE_G | FILE_H)
+ROW_MASKS = [0xFF << (8 * row) for row in range(8)]
+FILE_MASKS = [FILE_A << col for col in range(8)]
+# squares a piece can land on after moving by a col change, also trims anything shifted past bit 63
+COL_CHANGE_MASKS = {0: FULL_BOARD, 1: NOT_FILE_A, 2: NOT_FILE_AB, -1: NOT_FILE_H, -2: NOT_FILE_GH}
+
+PIECES = ("wP", "wN", "wB", "wR", "wQ", "wK", "bP", "bN", "bB", "bR", "bQ", "bK")
+PIECE_VALUES = {piece: pieceScore[piece[1]] for piece in PIECES}
+PIECE_PHASES = {piece: PHASE_WEIGHTS[piece[1]] for piece in PIECES}
+
+# Directions as (row change, col change), same convention as the direction tuples in GameState
+ROOK_DIRECTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1))  # Up , Down , Left , Right
+BISHOP_DIRECTIONS = ((-1, 1), (1, 1), (1, -1), (-1, -1))  # D_URight, D_LRight, D_LLeft, D_ULeft
+QUEEN_DIRECTIONS = ROOK_DIRECTIONS + BISHOP_DIRECTIONS
+KNIGHT_OFFSETS = ((-2, -1), (-1, -2), (-2, 1), (1, -2), (-1, 2), (2, -1), (1, 2), (2, 1))
+KING_OFFSETS = QUEEN_DIRECTIONS
+
+'''
+Helper functions for working with bitboards
+'''
+def SquareIndex(row, col):
+    return row * 8 + col
+
+def IterateSquares(bitboard):
+    # yields the square index of every set bit, lowest bit first
+    while bitboard:
+        lowest_bit = bitboard & -bitboard
+        yield lowest_bit.bit_length() - 1
+        bitboard ^= lowest_bit
+
+def PopCount(bitboard):
+    return bin(bitboard).count("1")
+
+'''
+Shifts every piece of the bitboard by (row_change, col_change), dropping the pieces which would leave the board
+(the file masks stop pieces on the edge files from wrapping around to the other side of the board)
+'''
+def ShiftBitboard(bitboard, row_change, col_change):
+    shift = row_change * 8 + col_change
+    if shift > 0:
+        return (bitboard << shift) & COL_CHANGE_MASKS[col_change]
+    return (bitboard >> -shift) & COL_CHANGE_MASKS[col_change]
+
+'''
+Attack sets computed with shifts, works on any number of pieces in the bitboard at once
+'''
+def KnightAttacks(bitboard):
+    attacks = 0
+    for row_change, col_change in KNIGHT_OFFSETS:
+        attacks |= ShiftBitboard(bitboard, row_change, col_change)
+    return attacks
+
+def KingAttacks(bitboard):
+    attacks = 0
+    for row_change, col_change in KING_OFFSETS:
+        attacks |= ShiftBitboard(bitboard, row_change, col_change)
+    return attacks
+
+def PawnAttacks(bitboard, color):
+    # white pawns attack towards row 0, black pawns towards row 7
+    row_change = -1 if color == "w" else 1
+    return ShiftBitboard(bitboard, row_change, -1) | ShiftBitboard(bitboard, row_change, 1)
+
+def SlidingAttacks(bitboard, occupied, directions):
+    # rays are extended one square at a time until they hit a piece (which is included as it can be captured)
+    # or leave the board
+    attacks = 0
+    for row_change, col_change in directions:
+        ray = bitboard
+        while True:
+            ray = ShiftBitboard(ray, row_change, col_change)
+            attacks |= ray
+            if not ray or ray & occupied:
+                break
+    return attacks
+
+
+class Bitboards:
+    def __init__(self, board_array):
+        self.LoadBoard(board_array)
+
+    '''
+    Rebuilds all the bitboards from a board_array (used at start and when the board is set up by hand)
+    '''
+    def LoadBoard(self, board_array):
+        self.pieces = dict.fromkeys(PIECES, 0)  # piece string -> bitboard of the squares it occupies
+        self.occupancy = {"w": 0, "b": 0}  # all the squares occupied by each side
+        self.piece_hash = 0  # Zobrist hash of the piece placement, the rest of the position key is added by GameState
+        self.pawn_hash = 0  # Zobrist hash of the pawns only, the key of the AI's pawn hash table
+        self.material = {"w": 0, "b": 0}  # sum of the piece values of each side
+        self.piece_square = {"w": 0, "b": 0}  # sum of the piece-square (influence) values of each side's pieces
+        self.piece_square_endgame = {"w": 0, "b": 0}  # the same with the endgame influence tables
+        self.phase = 0  # sum of the phase weights of all the pieces, MAX_PHASE (or more) in the opening
+        for row in range(8):
+            for col in range(8):
+                piece = board_array[row, col]
+                if piece != "--":
+                    self.TogglePiece(piece, SquareIndex(row, col))
+
+    '''
+    Adds the piece on the square if it is not there, removes it if it is. As XOR is its own inverse the same calls
+    made by MakeMove() can be repeated by UndoMove() to restore the bitboards (and the piece hashes). The material and
+    piece-square totals and the phase are added to or taken from depending on which of the two it was
+    '''
+    def TogglePiece(self, piece, square):
+        bit = 1 << square
+        self.pieces[piece] ^= bit
+        self.occupancy[piece[0]] ^= bit
+        self.piece_hash ^= PIECE_KEYS[piece][square]
+        if piece[1] == "P":
+            self.pawn_hash ^= PIECE_KEYS[piece][square]
+        if self.pieces[piece] & bit:  # piece added
+            self.material[piece[0]] += PIECE_VALUES[piece]
+            self.piece_square[piece[0]] += Piece_Square_Influence[piece][square]
+            self.piece_square_endgame[piece[0]] += Piece_Square_Endgame_Influence[piece][square]
+            self.phase += PIECE_PHASES[piece]
+        else:
+            self.material[piece[0]] -= PIECE_VALUES[piece]
+            self.piece_square[piece[0]] -= Piece_Square_Influence[piece][square]
+            self.piece_square_endgame[piece[0]] -= Piece_Square_Endgame_Influence[piece][square]
+            self.phase -= PIECE_PHASES[piece]
+
+    def Occupied(self):
+        return self.occupancy["w"] | self.occupancy["b"]
+
+    def Empty(self):
+        return FULL_BOARD ^ (self.occupancy["w"] | self.occupancy["b"])
+
+    def PieceSquares(self, piece):
+        return IterateSquares(self.pieces[piece])
+
+    def PieceCount(self, piece):
+        return PopCount(self.pieces[piece])
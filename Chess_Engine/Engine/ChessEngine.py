@@ -1,9 +1,13 @@
 """ The GameState() class is responsible for storing and managing all the information of the current state of the game
 . Also determines the valid move sets in the current state and the move logs"""
 import numpy as np
+from ChessBitboard import Bitboards, IterateSquares, PawnAttacks, FULL_BOARD
+from ChessZobrist import CASTLING_KEYS, EN_PASSANT_KEYS, WHITE_TO_MOVE_KEY, CastlingRightsIndex
+from ChessAttackTables import KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, RAYS, LINES, RookAttacks, BishopAttacks, QueenAttacks
+from ChessEvaluationTables import pieceScore, PHASE_WEIGHTS, Piece_Square_Influence, Piece_Square_Endgame_Influence
 
 class GameState:
-    def __init__(self):
+    def __init__(self, use_bitboards=True, debug_evaluation=False):
         # board is the 8x8 2d numpy array containing the pieces and represented by 2 characters
         # first character represents the "Color" of the piece(White or Black)
         # second character represents the "Type" of the piece(King, Queen, Rook)
@@ -29,9 +33,22 @@ class GameState:
 #     ['--', '--', '--', '--', '--', '--', '--', '--'],  # Rank 2
 #     ['wR', '--', '--', '--', 'wK', '--', '--', 'wR']   # Rank 1: wR on a1, wK on e1, wR on h1
 # ], dtype=object)
+        # bitboards (one 64-bit integer per piece type and colour) kept in sync with board_array
+        # use_bitboards=False falls back to the original move generators which scan board_array square by square
+        self.bitboards = Bitboards(self.board_array)
+        self.use_bitboards = use_bitboards
+        # debug_evaluation=True recomputes the material and piece-square totals from board_array after every move
+        # and undo, raising an error if the incremental values kept by the bitboards went wrong
+        self.debug_evaluation = debug_evaluation
+        self.attack_maps = {"w": None, "b": None} # cached squares attacked by each side, see GetAttackMap()
         # mapping the piece type letter to the function having the logic of that piece
-        self.PieceMoveFunctions = {'P': self.GetPawnMoves, "R": self.GetRookMoves, "N": self.GetKnightMoves,
-                                   "B": self.GetBishopMoves, "Q": self.GetQueenMoves, "K": self.GetKingMoves}
+        if self.use_bitboards:
+            self.PieceMoveFunctions = {'P': self.GetPawnMoves_Bitboard, "R": self.GetRookMoves_Bitboard,
+                                       "N": self.GetKnightMoves_Bitboard, "B": self.GetBishopMoves_Bitboard,
+                                       "Q": self.GetQueenMoves_Bitboard, "K": self.GetKingMoves_Bitboard}
+        else:
+            self.PieceMoveFunctions = {'P': self.GetPawnMoves, "R": self.GetRookMoves, "N": self.GetKnightMoves,
+                                       "B": self.GetBishopMoves, "Q": self.GetQueenMoves, "K": self.GetKingMoves}
         self.whiteToMove = True
         self.white_pieces = 16  # Total white pieces at the start
         self.black_pieces = 16  # Total black pieces at the start
@@ -41,7 +58,8 @@ class GameState:
         self.Checkmate = False
         self.Stalemate = False
         self.inCheckFlag = False
-        self.pins = []
+        self.pins = {}  # square (row * 8 + col) of every pinned piece -> direction of the pin from the king
+        self.target_squares = FULL_BOARD  # squares the move generators may move pieces other than the king to
         self.checks = []
         self.EnPassantPossible = ()  # coordinates of square where enpassant is possible
         self.EnPassantPossibleLog = [self.EnPassantPossible] # Logs to keep track of the Enpassant Capture moves
@@ -50,26 +68,101 @@ class GameState:
         self.CurrentCastlingRights = CastleRights(True, True, True, True)
         self.CastleRightsLog = [CastleRights(self.CurrentCastlingRights.WhiteKSide, self.CurrentCastlingRights.BlackKSide,
                                              self.CurrentCastlingRights.WhiteQSide, self.CurrentCastlingRights.BlackQSide)]
-        # tracking positions of the game with a hashing like ID
+        # tracking positions of the game with a 64-bit Zobrist key (Polyglot compatible), see GetPositionKey()
         self.position_history = {} # dictionary to track position occurrences
         self.position_key = self.GetPositionKey() # initial position
         self.position_history[self.position_key] = 1
+        self.PositionKeyLog = [self.position_key] # keys of every position reached, popped by UndoMove()
+        self.start_fen = None # FEN the game was loaded from by LoadFEN(), None for the standard starting position
+
+    '''
+    Sets up the position of a FEN (Forsyth–Edwards Notation) string, the reverse of game_state_to_fen(). The move log
+    and position history start over from this position
+    '''
+    def LoadFEN(self, fen):
+        fields = fen.split()
+        ranks = fields[0].split("/")
+        if len(fields) < 2 or len(ranks) != 8:
+            raise ValueError(f"Invalid FEN: {fen}")
+        castling = fields[2] if len(fields) > 2 else "-"
+        en_passant = fields[3] if len(fields) > 3 else "-"
+        self.board_array = np.full((8, 8), "--", dtype=object)
+        for row, rank in enumerate(ranks):
+            col = 0
+            for char in rank:
+                if char.isdigit():
+                    col += int(char)
+                else:
+                    self.board_array[row, col] = ("w" if char.isupper() else "b") + char.upper()
+                    col += 1
+        self.bitboards = Bitboards(self.board_array)
+        self.attack_maps = {"w": None, "b": None}
+        self.whiteToMove = fields[1] == "w"
+        pieces = list(self.board_array.ravel())
+        self.white_pieces = sum(piece[0] == "w" for piece in pieces)
+        self.black_pieces = sum(piece[0] == "b" for piece in pieces)
+        self.moveLog = []
+        for row, col in zip(*np.nonzero(self.board_array == "wK")):
+            self.WhiteKingLocation = (int(row), int(col))
+        for row, col in zip(*np.nonzero(self.board_array == "bK")):
+            self.BlackKingLocation = (int(row), int(col))
+        self.Checkmate = False
+        self.Stalemate = False
+        self.inCheckFlag = False
+        self.pins = {}
+        self.target_squares = FULL_BOARD
+        self.checks = []
+        if en_passant != "-":
+            self.EnPassantPossible = (Move.ranksToRanks[en_passant[1]], Move.filesToCols[en_passant[0]])
+        else:
+            self.EnPassantPossible = ()
+        self.EnPassantPossibleLog = [self.EnPassantPossible]
+        self.halfmoveclock = int(fields[4]) if len(fields) > 4 else 0
+        self.fullmovecounter = int(fields[5]) if len(fields) > 5 else 1
+        self.CurrentCastlingRights = CastleRights("K" in castling, "k" in castling, "Q" in castling, "q" in castling)
+        self.CastleRightsLog = [CastleRights(self.CurrentCastlingRights.WhiteKSide, self.CurrentCastlingRights.BlackKSide,
+                                             self.CurrentCastlingRights.WhiteQSide, self.CurrentCastlingRights.BlackQSide)]
+        self.position_key = self.GetPositionKey()
+        self.position_history = {self.position_key: 1}
+        self.PositionKeyLog = [self.position_key]
+        self.start_fen = fen
+
+    '''
+    The valid move written in coordinate notation (see Move.GetUCI()), None if there is no such move
+    '''
+    def ParseMove(self, text):
+        for move in self.GetValidMoves():
+            if move.GetUCI() == text:
+                return move
+        return None
 
     '''
-    Function to create a unique string for the current board state (can be improved with Zobrist Hashing for Transposition Tables)
-    Might be done in the future
+    Function to get the Zobrist key of the current position. The piece part is kept up to date incrementally by the
+    bitboards on every move, castling rights, the en passant file and the side to move are then XOR-ed in from tables.
+    As in Polyglot, the en passant file only counts when a pawn of the side to move is there to capture en passant
     '''
     def GetPositionKey(self):
-        board_string = str(self.board_array) # Board Configuration
-        castling_string = str(self.CurrentCastlingRights) # Castling availability
-        enpassant_string = str(self.EnPassantPossible) # En Passant target square
-        side_to_move = "w" if self.whiteToMove else "b"
-        return board_string + castling_string + enpassant_string + side_to_move
+        key = self.bitboards.piece_hash ^ CASTLING_KEYS[CastlingRightsIndex(self.CurrentCastlingRights)]
+        if self.EnPassantPossible:
+            ep_row, ep_col = self.EnPassantPossible
+            if self.whiteToMove:
+                capturing_pawns = PAWN_ATTACKS['b'][ep_row * 8 + ep_col] & self.bitboards.pieces["wP"]
+            else:
+                capturing_pawns = PAWN_ATTACKS['w'][ep_row * 8 + ep_col] & self.bitboards.pieces["bP"]
+            if capturing_pawns:
+                key ^= EN_PASSANT_KEYS[ep_col]
+        if self.whiteToMove:
+            key ^= WHITE_TO_MOVE_KEY
+        return key
 
     '''
     The MakeMove() method is used to update the game state when a move is made.
+    search=True is used by the AI while searching: only the board, kings, castling rights, en passant and the position
+    key are updated, the chess notation flags and the position history are only needed for the moves actually played
     '''
-    def MakeMove(self, move):
+    def MakeMove(self, move, search=False):
+        if not search:
+            move.disambiguate = self.GetDisambiguation(move)
         self.board_array[move.startRow, move.startCol] = "--"
         self.board_array[move.endRow, move.endCol] = move.pieceMoved
         self.moveLog.append(move)  # keeping logs/track of piece move
@@ -119,31 +212,66 @@ class GameState:
                 self.board_array[move.endRow, move.endCol + 1] = self.board_array[move.endRow, move.endCol - 2] # Move rook to new square
                 self.board_array[move.endRow, move.endCol - 2] = '--' # Remove the rook
 
-        # checking if the current move offers a check to opponent king (purely for chess notation purposes)
-        # we check this explicitly in ChessMain function for proper game handling
-        if self.inCheck():
-            move.in_check = True
-            # checking for checkmate (no legal moves for enemy)
-            if not self.GetValidMoves(): # no valid moves present
-                move.is_checkmate = True
-        else:
-            move.in_check = False
-            move.is_checkmate = False
+        # keeping the bitboards in sync with the board
+        self.UpdateBitboards(move)
 
         # update castling rights - happens when it's a rook or king move
         self.UpdateCastleRights(move)
         self.CastleRightsLog.append(CastleRights(self.CurrentCastlingRights.WhiteKSide, self.CurrentCastlingRights.BlackKSide,
                                                  self.CurrentCastlingRights.WhiteQSide, self.CurrentCastlingRights.BlackQSide))
 
-        # After the move is made, we update the position history
         self.position_key = self.GetPositionKey()
-        self.position_history[self.position_key] = self.position_history.get(self.position_key, 0) + 1
+        self.PositionKeyLog.append(self.position_key)
+        if self.debug_evaluation:
+            self.CheckIncrementalEvaluation()
+
+        if not search:
+            # checking if the current move offers a check to opponent king (purely for chess notation purposes)
+            # we check this explicitly in ChessMain function for proper game handling
+            if self.inCheck():
+                move.in_check = True
+                # checking for checkmate (no legal moves for enemy)
+                if not self.GetValidMoves(): # no valid moves present
+                    move.is_checkmate = True
+            else:
+                move.in_check = False
+                move.is_checkmate = False
+
+            # After the move is made, we update the position history
+            self.position_history[self.position_key] = self.position_history.get(self.position_key, 0) + 1
+
+    '''
+    Null move used by the AI's null move pruning: the side to move passes its turn. Only the turn, the en passant
+    square and the position key change, UndoNullMove() restores them
+    '''
+    def MakeNullMove(self):
+        self.whiteToMove = not self.whiteToMove
+        self.EnPassantPossible = ()
+        self.EnPassantPossibleLog.append(self.EnPassantPossible)
+        self.position_key = self.GetPositionKey()
+        self.PositionKeyLog.append(self.position_key)
+
+    def UndoNullMove(self):
+        self.PositionKeyLog.pop()
+        self.position_key = self.PositionKeyLog[-1]
+        self.EnPassantPossibleLog.pop()
+        self.EnPassantPossible = self.EnPassantPossibleLog[-1]
+        self.whiteToMove = not self.whiteToMove
+        self.Checkmate = False
+        self.Stalemate = False
 
     '''
-    Undo the last move
+    Undo the last move, search must match the value the move was made with
     '''
-    def UndoMove(self):
+    def UndoMove(self, search=False):
         if len(self.moveLog) != 0:  # checking so that there exists a move to undo
+            if not search:
+                # the position being left is taken out of the position history
+                self.position_history[self.position_key] -= 1
+                if self.position_history[self.position_key] == 0:
+                    del self.position_history[self.position_key]
+            self.PositionKeyLog.pop()
+            self.position_key = self.PositionKeyLog[-1] # key of the position before the move
             move = self.moveLog.pop()  # remove the last move from the logs
             self.board_array[move.startRow, move.startCol] = move.pieceMoved
             self.board_array[move.endRow, move.endCol] = move.pieceCaptured
@@ -176,7 +304,11 @@ class GameState:
 
             # undoing Castling Rights
             self.CastleRightsLog.pop() # get rid of the new castle rights from the move we are undoing
-            self.CurrentCastlingRights = self.CastleRightsLog[-1] # set the current castle rights to the last one in the list of Castle Rights
+            # set the current castle rights to a copy of the last one in the list of Castle Rights
+            # (a copy, as UpdateCastleRights() changes the current rights in place and would otherwise alter the log)
+            Last_Castle_Rights = self.CastleRightsLog[-1]
+            self.CurrentCastlingRights = CastleRights(Last_Castle_Rights.WhiteKSide, Last_Castle_Rights.BlackKSide,
+                                                      Last_Castle_Rights.WhiteQSide, Last_Castle_Rights.BlackQSide)
 
             # Undo Castle Move
             if move.IsCastleMove:
@@ -187,10 +319,75 @@ class GameState:
                     self.board_array[move.endRow, move.endCol - 2] = self.board_array[move.endRow, move.endCol + 1]
                     self.board_array[move.endRow, move.endCol + 1] = '--'
 
+            # same toggles as in MakeMove() restore the bitboards
+            self.UpdateBitboards(move)
+            if self.debug_evaluation:
+                self.CheckIncrementalEvaluation()
+
             #Flag reset(possible use by AI)
             self.Checkmate = False
             self.Stalemate = False
 
+    '''
+    Function to update the bitboards for a move, calling it a second time with the same move undoes it
+    '''
+    def UpdateBitboards(self, move):
+        bitboards = self.bitboards
+        self.attack_maps["w"] = self.attack_maps["b"] = None # the cached attack maps no longer match the board
+        start_square = move.startRow * 8 + move.startCol
+        end_square = move.endRow * 8 + move.endCol
+        if move.EnPassant:
+            bitboards.TogglePiece(move.pieceCaptured, move.startRow * 8 + move.endCol) # captured pawn is beside the start square
+        elif move.pieceCaptured != "--":
+            bitboards.TogglePiece(move.pieceCaptured, end_square)
+        bitboards.TogglePiece(move.pieceMoved, start_square)
+        if move.PawnPromotion:
+            bitboards.TogglePiece(move.pieceMoved[0] + move.Pawn_Promoted_to, end_square)
+        else:
+            bitboards.TogglePiece(move.pieceMoved, end_square)
+        if move.IsCastleMove:
+            rook = move.pieceMoved[0] + "R"
+            if move.endCol - move.startCol == 2: # King Side Castling
+                bitboards.TogglePiece(rook, move.endRow * 8 + move.endCol + 1)
+                bitboards.TogglePiece(rook, move.endRow * 8 + move.endCol - 1)
+            else: # Queen Side Castling
+                bitboards.TogglePiece(rook, move.endRow * 8 + move.endCol - 2)
+                bitboards.TogglePiece(rook, move.endRow * 8 + move.endCol + 1)
+
+    '''
+    Rebuilds the bitboards after board_array has been changed directly (e.g. when setting up a custom position)
+    '''
+    def RefreshBitboards(self):
+        self.bitboards.LoadBoard(self.board_array)
+        self.attack_maps["w"] = self.attack_maps["b"] = None
+        self.position_key = self.GetPositionKey()
+        self.PositionKeyLog[-1] = self.position_key
+
+    '''
+    Debug check of the material, piece-square and phase totals kept incrementally by the bitboards against a full
+    recompute from board_array
+    '''
+    def CheckIncrementalEvaluation(self):
+        material = {"w": 0, "b": 0}
+        piece_square = {"w": 0, "b": 0}
+        piece_square_endgame = {"w": 0, "b": 0}
+        phase = 0
+        for row in range(8):
+            for col in range(8):
+                piece = self.board_array[row, col]
+                if piece != "--":
+                    material[piece[0]] += pieceScore[piece[1]]
+                    piece_square[piece[0]] += Piece_Square_Influence[piece][row * 8 + col]
+                    piece_square_endgame[piece[0]] += Piece_Square_Endgame_Influence[piece][row * 8 + col]
+                    phase += PHASE_WEIGHTS[piece[1]]
+        if material != self.bitboards.material or piece_square != self.bitboards.piece_square or \
+                piece_square_endgame != self.bitboards.piece_square_endgame or phase != self.bitboards.phase:
+            raise RuntimeError(f"Incremental evaluation out of sync after {self.moveLog[-1] if self.moveLog else 'start'}: "
+                               f"material {self.bitboards.material} != {material}, "
+                               f"piece-square {self.bitboards.piece_square} != {piece_square}, "
+                               f"endgame piece-square {self.bitboards.piece_square_endgame} != {piece_square_endgame}, "
+                               f"phase {self.bitboards.phase} != {phase}")
+
     '''
     Get all moves considering checks of the pieces
     '''
@@ -211,28 +408,19 @@ class GameState:
             kingCol = self.BlackKingLocation[1]
         if self.inCheckFlag:
             if len(self.checks) == 1:  # only 1 check, block check with piece or move kind
-                moves = self.GetAllPossibleMoves()
                 # to block check, we must put a piece on a square in front of the king and the enemy piece
                 check = self.checks[0]  # check information
                 checkRow, checkCol = check[0], check[1]
-                pieceChecking = self.board_array[checkRow, checkCol]
-                validSquares = []  # squares that pieces can move to
+                checkSquare = checkRow * 8 + checkCol
+                evasionSquares = 1 << checkSquare  # squares that pieces other than the king can move to
                 # if knight, must capture knight or move king, other pieces are blocked
-                if pieceChecking[1] == "N":
-                    validSquares = [(checkRow, checkCol)]  # to capture the knight as it's the only valid move
-                else:  # blocking check with pieces
-                    for i in range(1,8):  # to generate a list of coordinates where the pieces can be moved to block the checks
-                        validSquare = (kingRow + check[2] * i, kingCol + check[3] * i)  # check[2] and check[3] are check directions
-                        validSquares.append(validSquare)
-                        if validSquare[0] == checkRow and validSquare[1] == checkCol:  # to get to the piece end checks
-                            break
-                # To get rid of moves that don't block check or to move the king
-                for i in range(len(moves) - 1, -1, -1):  # going through the list in reverse to maintain iteration index
-                    if moves[i].pieceMoved[1] != 'K':  # move doesn't move king so it must be blocked or captured
-                        if not (moves[i].endRow,moves[i].endCol) in validSquares:  # move doesn't block check or capture piece
-                            moves.remove(moves[i])
+                if self.board_array[checkRow, checkCol][1] != "N":  # blocking check with pieces
+                    # squares between the king and the checking piece, check[2] and check[3] are check directions
+                    evasionSquares |= RAYS[(check[2], check[3])][kingRow * 8 + kingCol] & RAYS[(-check[2], -check[3])][checkSquare]
+                # Only king moves, captures of the checking piece and blocks are generated
+                moves = self.GetAllPossibleMoves(evasionSquares)
             else:  # double check, king has to move
-                self.GetKingMoves(kingRow, kingCol, moves)
+                self.PieceMoveFunctions["K"](kingRow, kingCol, moves)
         else:  # not in check so all moves are totally valid
             moves = self.GetAllPossibleMoves()
             if self.whiteToMove:
@@ -256,53 +444,52 @@ class GameState:
     Get all moves while not considering checks being done by evaluating the possible moves from both sides
     '''
 
-    def GetAllPossibleMoves(self):
+    def GetAllPossibleMoves(self, target_squares=FULL_BOARD):
+        # target_squares -> bitboard of the squares pieces other than the king may move to (the check evasion squares
+        # when in check), read by the bitboard generators
         moves = []
-        for row in range(len(self.board_array)):  # number of rows
-            for col in range(len(self.board_array[row])):  # number of cols in given row
-                color_turn = self.board_array[row, col][0]  # to store the turn (white/black)
-                if (color_turn == "w" and self.whiteToMove) or (
-                        color_turn == "b" and not self.whiteToMove):  # checking turns
-                    piece = self.board_array[row][col][1]  # to store the piece
-                    self.PieceMoveFunctions[piece](row, col, moves)  # get the function associated with the piece type
-
-        # Grouping moves by (piece type, endRow, endCol)
-        move_groups = {}
-        for move in moves:
-            key = (move.pieceMoved[1], move.endRow, move.endCol)
-            if key not in move_groups:
-                move_groups[key] = []
-            move_groups[key].append(move)
-
-        # setting disambiguation for group with multiple moves
-        # if multiple moves exist in a group, we check for each move's start position with others
-        # if file (column) is unique, we use it (e.g., "b" for Nbd4), if rank (row) is unique, we use it (e.g., "1" for N1d4)
-        # if either is unique, we use both of them (e.g., "b1" for Nb1d4)
-        # if only one move, then no disambiguation
-        for key, group in move_groups.items():
-            if len(group) > 1:
-                start_files = [move.startCol for move in group]
-                start_ranks = [move.startRow for move in group]
-                for move in group:
-                    # Excluding the current move's own position when checking for others
-                    other_files = [file for file in start_files if file != move.startCol]
-                    other_ranks = [rank for rank in start_ranks if rank!= move.startRow]
-                    if move.startCol not in other_files:
-                        move.disambiguate = move.colsToFiles[move.startCol]
-                    elif move.startRow not in other_ranks:
-                        move.disambiguate = move.rowsToRanks[move.startRow]
-                    else:
-                        move.disambiguate = move.getRankFile(move.startRow, move.startCol)
-            else:
-                group[0].disambiguate = "" # no disambiguation needed
+        self.target_squares = target_squares
+        if self.use_bitboards:
+            # only visiting the squares of the pieces of the side to move, straight from their bitboards
+            allyColor = "w" if self.whiteToMove else "b"
+            for piece, move_function in self.PieceMoveFunctions.items():
+                for square in IterateSquares(self.bitboards.pieces[allyColor + piece]):
+                    move_function(square >> 3, square & 7, moves)
+        else:
+            for row in range(len(self.board_array)):  # number of rows
+                for col in range(len(self.board_array[row])):  # number of cols in given row
+                    color_turn = self.board_array[row, col][0]  # to store the turn (white/black)
+                    if (color_turn == "w" and self.whiteToMove) or (
+                            color_turn == "b" and not self.whiteToMove):  # checking turns
+                        piece = self.board_array[row][col][1]  # to store the piece
+                        self.PieceMoveFunctions[piece](row, col, moves)  # get the function associated with the piece type
+            if target_squares != FULL_BOARD: # these generators don't know about the target squares, filtering after
+                moves = [move for move in moves if move.pieceMoved[1] == "K" or target_squares >> (move.endRow * 8 + move.endCol) & 1
+                         or (move.EnPassant and target_squares >> (move.startRow * 8 + move.endCol) & 1)]
         return moves
 
+    '''
+    Chess notation: what tells the move apart from the other moves of the same piece type to the same square, computed
+    only for the moves actually played (by MakeMove()) as the moves generated while searching are never displayed.
+    It has to be called in the position the move is made from, the other moves are all the possible moves there
+    (pins are taken into account but checks are not). When there are other moves the start file is used (e.g. "b" for Nbd4)
+    '''
+    def GetDisambiguation(self, move):
+        if move.pieceMoved[1] in "PK" or move.IsCastleMove: # pawn and king moves never need it
+            return ""
+        self.inCheckFlag, self.pins, self.checks = self.CheckForPinsAndChecks() # pins of this position for the generators
+        for other in self.GetAllPossibleMoves():
+            if other.pieceMoved[1] == move.pieceMoved[1] and other.endRow == move.endRow and other.endCol == move.endCol \
+                    and (other.startRow, other.startCol) != (move.startRow, move.startCol):
+                return move.colsToFiles[move.startCol]
+        return ""
+
     '''
     Method to check for Pins and Checks from the list of generated moved
     '''
 
     def CheckForPinsAndChecks(self):
-        pins = []  # squares where the allied pinned piece is and direction pinned from
+        pins = {}  # square of every allied pinned piece -> direction pinned from
         checks = []  # squares where enemy is applying a check
         inCheckFlag = False
         if self.whiteToMove:
@@ -328,7 +515,7 @@ class GameState:
                     endPiece = self.board_array[endRow, endCol]
                     if endPiece[0] == allyColor and endPiece[1] != 'K':
                         if possiblePin == ():  # 1st allied piece could be pinned
-                            possiblePin = (endRow, endCol, direction[0], direction[1])
+                            possiblePin = (endRow * 8 + endCol, direction)
                         else:  # 2nd allied piece check, so no pin or check possible in this direction
                             break
                     elif endPiece[0] == enemyColor:
@@ -350,7 +537,7 @@ class GameState:
                                 checks.append((endRow, endCol, direction[0], direction[1]))
                                 break
                             else:  # piece blocking so pin
-                                pins.append(possiblePin)
+                                pins[possiblePin[0]] = possiblePin[1]
                                 break
                         else:  # enemy piece not applying check
                             break
@@ -374,24 +561,163 @@ class GameState:
 
     def inCheck(self):
         if self.whiteToMove:
-            return self.SquareUnderAttack(self.WhiteKingLocation[0],
-                                          self.WhiteKingLocation[1])  # checking if white square under attack
+            return self.IsSquareAttacked(self.WhiteKingLocation[0], self.WhiteKingLocation[1], 'b')  # checking if white king square under attack
         else:
-            return self.SquareUnderAttack(self.BlackKingLocation[0],
-                                          self.BlackKingLocation[1])  # checking if black square under attack
+            return self.IsSquareAttacked(self.BlackKingLocation[0], self.BlackKingLocation[1], 'w')  # checking if black king square under attack
 
     '''
     Function determines if the enemy can attack the square
     '''
 
     def SquareUnderAttack(self, row, col):
-        self.whiteToMove = not self.whiteToMove  # switch to opponent's turn
-        Opponent_Moves = self.GetAllPossibleMoves()
-        self.whiteToMove = not self.whiteToMove  # switch turns back
-        for move in Opponent_Moves:  # get all possible moves
-            if move.endRow == row and move.endCol == col:  # Square under attack
-                return True
-        return False
+        return self.IsSquareAttacked(row, col, 'b' if self.whiteToMove else 'w')
+
+    '''
+    Function to check if a move gives check without making it: the moved (or promoted) piece attacks the enemy king from
+    its end square, or leaving its start square (or the pawn captured en passant) uncovers a rook, bishop or queen
+    behind it. MakeMove(search=True) doesn't set move.in_check, so the AI asks this instead
+    '''
+    def GivesCheck(self, move):
+        color = move.pieceMoved[0]
+        kingRow, kingCol = self.BlackKingLocation if color == 'w' else self.WhiteKingLocation
+        king_square = kingRow * 8 + kingCol
+        king_bit = 1 << king_square
+        pieces = self.bitboards.pieces
+        start_square = move.startRow * 8 + move.startCol
+        end_square = move.endRow * 8 + move.endCol
+        occupied = (self.bitboards.Occupied() & ~(1 << start_square)) | (1 << end_square)
+        if move.EnPassant:
+            occupied &= ~(1 << (move.startRow * 8 + move.endCol))
+        if move.IsCastleMove: # only the rook can give check
+            if move.endCol - move.startCol == 2: # King Side Castling
+                rook_start, rook_end = end_square + 1, end_square - 1
+            else: # Queen Side Castling
+                rook_start, rook_end = end_square - 2, end_square + 1
+            occupied = (occupied & ~(1 << rook_start)) | (1 << rook_end)
+            return bool(RookAttacks(rook_end, occupied) & king_bit)
+
+        # direct check from the end square
+        piece = move.Pawn_Promoted_to if move.PawnPromotion else move.pieceMoved[1]
+        if piece == "P":
+            attacks = PAWN_ATTACKS[color][end_square]
+        elif piece == "N":
+            attacks = KNIGHT_ATTACKS[end_square]
+        elif piece == "B":
+            attacks = BishopAttacks(end_square, occupied)
+        elif piece == "R":
+            attacks = RookAttacks(end_square, occupied)
+        elif piece == "Q":
+            attacks = QueenAttacks(end_square, occupied)
+        else:
+            attacks = 0
+        if attacks & king_bit:
+            return True
+
+        # discovered check by the other sliders (the moved piece is still on its start square in the bitboards)
+        others = FULL_BOARD ^ (1 << start_square)
+        queens = pieces[color + "Q"]
+        if RookAttacks(king_square, occupied) & (pieces[color + "R"] | queens) & others:
+            return True
+        return bool(BishopAttacks(king_square, occupied) & (pieces[color + "B"] | queens) & others)
+
+    '''
+    Function to check if a square is attacked by the given side, without generating any moves. We look outward from the
+    target square with the attack tables: a piece attacks the square exactly when the same kind of piece placed on the
+    square would attack it back (for pawns, a pawn of the other colour). The occupancy can be passed in to look at the
+    board with pieces removed, e.g. the king when checking the squares it moves to
+    '''
+    def IsSquareAttacked(self, row, col, attackerColor, occupied=None):
+        pieces = self.bitboards.pieces
+        square = row * 8 + col
+        if occupied is None:
+            occupied = self.bitboards.Occupied()
+        if PAWN_ATTACKS['b' if attackerColor == 'w' else 'w'][square] & pieces[attackerColor + "P"]:
+            return True
+        if KNIGHT_ATTACKS[square] & pieces[attackerColor + "N"]:
+            return True
+        if KING_ATTACKS[square] & pieces[attackerColor + "K"]:
+            return True
+        queens = pieces[attackerColor + "Q"]
+        if RookAttacks(square, occupied) & (pieces[attackerColor + "R"] | queens):
+            return True
+        return bool(BishopAttacks(square, occupied) & (pieces[attackerColor + "B"] | queens))
+
+    '''
+    Bitboard of every square attacked by the given side. It is cached until the next MakeMove()/UndoMove(), which is
+    useful when several squares have to be checked on the same board (like the squares the king crosses when castling)
+    '''
+    def GetAttackMap(self, color):
+        if self.attack_maps[color] is None:
+            pieces = self.bitboards.pieces
+            occupied = self.bitboards.Occupied()
+            attacks = PawnAttacks(pieces[color + "P"], color) # all the pawns at once
+            for square in IterateSquares(pieces[color + "N"]):
+                attacks |= KNIGHT_ATTACKS[square]
+            for square in IterateSquares(pieces[color + "B"] | pieces[color + "Q"]):
+                attacks |= BishopAttacks(square, occupied)
+            for square in IterateSquares(pieces[color + "R"] | pieces[color + "Q"]):
+                attacks |= RookAttacks(square, occupied)
+            for square in IterateSquares(pieces[color + "K"]):
+                attacks |= KING_ATTACKS[square]
+            self.attack_maps[color] = attacks
+        return self.attack_maps[color]
+
+    '''
+    Bitboard of the pieces of both sides attacking a square for the given occupancy. Sliders are looked up with the
+    occupancy passed in, so removing a piece from it uncovers the x-ray attackers behind it
+    '''
+    def AttackersTo(self, square, occupied):
+        pieces = self.bitboards.pieces
+        queens = pieces["wQ"] | pieces["bQ"]
+        return ((PAWN_ATTACKS['b'][square] & pieces["wP"]) | (PAWN_ATTACKS['w'][square] & pieces["bP"])
+                | (KNIGHT_ATTACKS[square] & (pieces["wN"] | pieces["bN"]))
+                | (KING_ATTACKS[square] & (pieces["wK"] | pieces["bK"]))
+                | (RookAttacks(square, occupied) & (pieces["wR"] | pieces["bR"] | queens))
+                | (BishopAttacks(square, occupied) & (pieces["wB"] | pieces["bB"] | queens))) & occupied
+
+    '''
+    Static Exchange Evaluation: material won (positive) or lost (negative) by the side making the capture once every
+    capture on the target square has been played out, each side always recapturing with its least valuable piece and
+    being free to stop when recapturing loses material. piece_values maps the piece letter to its value.
+    The exchange is cut short once the side to recapture is behind whether it recaptures or not, so the sign of the
+    result is always right (all Is_Losing_Capture() needs) but a gain can come out larger than the full exchange gives.
+    Pins are not taken into account
+    '''
+    def StaticExchangeEvaluation(self, move, piece_values):
+        pieces = self.bitboards.pieces
+        target = move.endRow * 8 + move.endCol
+        occupied = self.bitboards.Occupied() ^ (1 << (move.startRow * 8 + move.startCol))
+        if move.EnPassant: # the captured pawn is not on the target square
+            occupied ^= 1 << (move.startRow * 8 + move.endCol)
+        gains = [piece_values[move.pieceCaptured[1]] if move.pieceCaptured != "--" else 0]
+        piece_on_target = move.Pawn_Promoted_to if move.PawnPromotion else move.pieceMoved[1]
+        if move.PawnPromotion:
+            gains[0] += piece_values[piece_on_target] - piece_values["P"]
+        side = "b" if move.pieceMoved[0] == "w" else "w"
+        while True:
+            attackers = self.AttackersTo(target, occupied) & self.bitboards.occupancy[side]
+            if not attackers:
+                break
+            for piece_type in "PNBRQK": # least valuable attacker first
+                attacker = attackers & pieces[side + piece_type]
+                if attacker:
+                    break
+            # the king can't recapture a square the other side still attacks
+            if piece_type == "K" and self.AttackersTo(target, occupied ^ (attacker & -attacker)) & \
+                    self.bitboards.occupancy["w" if side == "b" else "b"]:
+                break
+            # the recapture wins the piece on the target square minus what was gained so far
+            gains.append(piece_values[piece_on_target] - gains[-1])
+            if max(-gains[-2], gains[-1]) < 0: # neither side can do better by continuing
+                gains.pop() # this recapture is not played, its gain can't count
+                break
+            occupied ^= attacker & -attacker # lowest one of the attackers
+            piece_on_target = piece_type
+            side = "w" if side == "b" else "b"
+        # going backwards, each side only recaptures when it gains from it
+        for index in range(len(gains) - 1, 0, -1):
+            gains[index - 1] = -max(-gains[index - 1], gains[index])
+        return gains[0]
 
     '''
     Function to check sufficient material is present on the board (As per Chess rules)
@@ -498,14 +824,8 @@ class GameState:
     '''
 
     def GetPawnMoves(self, row, col, validMoves):
-        piecePinned = False
-        pinDirection = ()
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == row and self.pins[i][1] == col:  # if the pawn is pinned
-                piecePinned = True
-                pinDirection = (self.pins[i][2], self.pins[i][3])
-                self.pins.remove(self.pins[i])
-                break
+        pinDirection = self.pins.get(row * 8 + col, ())  # pin direction, () if the piece is not pinned
+        piecePinned = pinDirection != ()
 
         if self.whiteToMove:
             moveAmount = -1
@@ -547,16 +867,18 @@ class GameState:
                             out_range = range(col + 1, 8)
                         else: # King is right of pawn
                             in_range = range(kingCol - 1, col, -1)
-                            out_range = range(col - 2, 0, -1)
+                            out_range = range(col - 2, -1, -1)
                         for i in in_range:
                             if self.board_array[row, i] != "--": # some other piece beside enpassant pawn is blocking
                                 blockingPiece = True
-                        for i in out_range:
+                        for i in out_range: # only the first piece outside can attack the king
                             square = self.board_array[row, i]
                             if square[0] == enemyColor and (square[1] == "R" or square[1] == "Q"):
                                 attackingPiece = True
+                                break
                             elif square != "--":
                                 blockingPiece = True
+                                break
                     if not attackingPiece or blockingPiece:
                         validMoves.append(Move((row, col), (row + moveAmount, col - 1), self.board_array, EnPassant=True))
         # Capture to right side
@@ -578,16 +900,18 @@ class GameState:
                             out_range = range(col + 2, 8)
                         else: # King is right of pawn
                             in_range = range(kingCol - 1, col + 1, -1)
-                            out_range = range(col - 1, 0, -1)
+                            out_range = range(col - 1, -1, -1)
                         for i in in_range:
                             if self.board_array[row, i] != "--": # some other piece beside enpassant pawn is blocking
                                 blockingPiece = True
-                        for i in out_range:
+                        for i in out_range: # only the first piece outside can attack the king
                             square = self.board_array[row, i]
                             if square[0] == enemyColor and (square[1] == "R" or square[1] == "Q"):
                                 attackingPiece = True
+                                break
                             elif square != "--":
                                 blockingPiece = True
+                                break
                     if not attackingPiece or blockingPiece:
                         validMoves.append(Move((row, col), (row + moveAmount, col + 1), self.board_array, EnPassant=True))
 
@@ -596,15 +920,8 @@ class GameState:
     '''
 
     def GetRookMoves(self, row, col, validMoves):
-        piecePinned = False
-        pinDirection = ()
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == row and self.pins[i][1] == col:
-                piecePinned = True
-                pinDirection = (self.pins[i][2], self.pins[i][3])
-                if self.board_array[row, col][1] != "Q":  # cant remove queen from pin on rook, only removing it on bishop moves(This code can be removed as the implementation that is done here is on pure logic rather than depending on two other functions
-                    self.pins.remove(self.pins[i])
-                break
+        pinDirection = self.pins.get(row * 8 + col, ())  # pin direction, () if the piece is not pinned
+        piecePinned = pinDirection != ()
 
         directions = ((-1, 0), (1, 0), (0, -1), (0, 1))  # Up , Down , Left , Right
         enemyColor = "b" if self.whiteToMove else "w"
@@ -630,12 +947,7 @@ class GameState:
     '''
 
     def GetKnightMoves(self, row, col, validMoves):
-        piecePinned = False
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == row and self.pins[i][1] == col:
-                piecePinned = True
-                self.pins.remove(self.pins[i])
-                break
+        piecePinned = row * 8 + col in self.pins
 
         KnightMoves = ((-2, -1), (-1, -2), (-2, 1), (1, -2), (-1, 2), (2, -1), (1, 2), (2, 1))  # possible squares
         allyColor = "w" if self.whiteToMove else "b"
@@ -653,14 +965,8 @@ class GameState:
     '''
 
     def GetBishopMoves(self, row, col, validMoves):
-        piecePinned = False
-        pinDirection = ()
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == row and self.pins[i][1] == col:
-                piecePinned = True
-                pinDirection = (self.pins[i][2], self.pins[i][3])
-                self.pins.remove(self.pins[i])
-                break
+        pinDirection = self.pins.get(row * 8 + col, ())  # pin direction, () if the piece is not pinned
+        piecePinned = pinDirection != ()
 
         directions = ((-1, 1), (1, 1), (1, -1), (-1, -1))  # D_URight, D_LRight, D_LLeft, D_ULeft diagonal moves
         enemyColor = "b" if self.whiteToMove else "w"
@@ -687,14 +993,8 @@ class GameState:
     '''
 
     def GetQueenMoves(self, row, col, validMoves):
-        piecePinned = False
-        pinDirection = ()
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == row and self.pins[i][1] == col:
-                piecePinned = True
-                pinDirection = (self.pins[i][2], self.pins[i][3])
-                self.pins.remove(self.pins[i])
-                break
+        pinDirection = self.pins.get(row * 8 + col, ())  # pin direction, () if the piece is not pinned
+        piecePinned = pinDirection != ()
         directions = ((-1, 0), (1, 0), (0, -1), (0, 1),  # Up , Down , Left , Right,
                       (-1, 1), (1, 1), (1, -1), (-1, -1))  #  D_URight, D_LRight, D_LLeft, D_ULeft
         enemyColor = "b" if self.whiteToMove else "w"
@@ -751,6 +1051,120 @@ class GameState:
                     else:
                         self.BlackKingLocation = (row, col)
 
+    '''
+    Bitboard move generators, used in place of the above methods when use_bitboards is set. Each one looks up the
+    squares the piece attacks in the precomputed attack tables and only creates Move objects for the set bits
+    '''
+
+    '''
+    Returns the pin direction of the piece on (row, col) or () if the piece is not pinned
+    '''
+    def GetPinDirection(self, row, col):
+        return self.pins.get(row * 8 + col, ())
+
+    '''
+    Adding a Move for every target square in the bitboard
+    '''
+    def AddMoves_Bitboard(self, row, col, targets, validMoves):
+        for square in IterateSquares(targets):
+            validMoves.append(Move((row, col), (square >> 3, square & 7), self.board_array))
+
+    def GetPawnMoves_Bitboard(self, row, col, validMoves):
+        if self.whiteToMove:
+            moveAmount = -1
+            startRow = 6
+            lastRow = 0
+            allyColor = 'w'
+            enemyColor = 'b'
+            kingRow, kingCol = self.WhiteKingLocation
+        else:
+            moveAmount = 1
+            startRow = 1
+            lastRow = 7
+            allyColor = 'b'
+            enemyColor = 'w'
+            kingRow, kingCol = self.BlackKingLocation
+
+        bitboards = self.bitboards
+        square = row * 8 + col
+        occupied = bitboards.Occupied()
+        targets = 0
+        # 1 Square move and 2 Square moves, Forward Moves
+        one_step = square + 8 * moveAmount
+        if not occupied >> one_step & 1:
+            targets |= 1 << one_step
+            two_step = one_step + 8 * moveAmount
+            if row == startRow and not occupied >> two_step & 1:
+                targets |= 1 << two_step
+        # Captures to left and right side
+        attacks = PAWN_ATTACKS[allyColor][square]
+        targets |= attacks & bitboards.occupancy[enemyColor]
+        targets &= self.target_squares
+        pinDirection = self.GetPinDirection(row, col)
+        if pinDirection: # pinned pawns can only move along the pin line
+            targets &= LINES[pinDirection][square]
+            attacks &= LINES[pinDirection][square]
+
+        if self.EnPassantPossible:
+            ep_row, ep_col = self.EnPassantPossible
+            ep_bit = 1 << (ep_row * 8 + ep_col)
+            # in check the capture has to land on a blocking square or take the checking pawn
+            if attacks & ep_bit and self.target_squares & (ep_bit | 1 << (row * 8 + ep_col)):
+                # both pawns leave the rank, so we check no enemy slider can reach the king through the empty squares
+                occupied_after = (occupied ^ (1 << square) ^ (1 << (row * 8 + ep_col))) | ep_bit
+                king_square = kingRow * 8 + kingCol
+                enemy_queens = bitboards.pieces[enemyColor + "Q"]
+                if not RookAttacks(king_square, occupied_after) & (bitboards.pieces[enemyColor + "R"] | enemy_queens) and \
+                        not BishopAttacks(king_square, occupied_after) & (bitboards.pieces[enemyColor + "B"] | enemy_queens):
+                    validMoves.append(Move((row, col), (ep_row, ep_col), self.board_array, EnPassant=True))
+
+        for square in IterateSquares(targets):
+            endRow, endCol = square >> 3, square & 7
+            if endRow == lastRow:
+                for piece in ['Q', 'R', 'B', 'N']:
+                    validMoves.append(Move((row, col), (endRow, endCol), self.board_array, Promotion_Piece=piece))
+            else:
+                validMoves.append(Move((row, col), (endRow, endCol), self.board_array))
+
+    '''
+    Rook, Bishop and Queen moves only differ in their attack tables. A pinned slider can only move along the pin line
+    '''
+    def GetSlidingMoves_Bitboard(self, row, col, attack_function, validMoves):
+        square = row * 8 + col
+        allyColor = "w" if self.whiteToMove else "b"
+        targets = attack_function(square, self.bitboards.Occupied()) & ~self.bitboards.occupancy[allyColor] & self.target_squares
+        pinDirection = self.GetPinDirection(row, col)
+        if pinDirection:
+            targets &= LINES[pinDirection][square]
+        self.AddMoves_Bitboard(row, col, targets, validMoves)
+
+    def GetRookMoves_Bitboard(self, row, col, validMoves):
+        self.GetSlidingMoves_Bitboard(row, col, RookAttacks, validMoves)
+
+    def GetBishopMoves_Bitboard(self, row, col, validMoves):
+        self.GetSlidingMoves_Bitboard(row, col, BishopAttacks, validMoves)
+
+    def GetQueenMoves_Bitboard(self, row, col, validMoves):
+        self.GetSlidingMoves_Bitboard(row, col, QueenAttacks, validMoves)
+
+    def GetKnightMoves_Bitboard(self, row, col, validMoves):
+        if self.GetPinDirection(row, col): # a pinned knight can never move
+            return
+        allyColor = "w" if self.whiteToMove else "b"
+        targets = KNIGHT_ATTACKS[row * 8 + col] & ~self.bitboards.occupancy[allyColor] & self.target_squares
+        self.AddMoves_Bitboard(row, col, targets, validMoves)
+
+    def GetKingMoves_Bitboard(self, row, col, validMoves):
+        allyColor = 'w' if self.whiteToMove else 'b'
+        enemyColor = 'b' if self.whiteToMove else 'w'
+        targets = KING_ATTACKS[row * 8 + col] & ~self.bitboards.occupancy[allyColor]
+        # the king is taken off the board so that squares further along a slider's line are still seen as attacked
+        occupied = self.bitboards.Occupied() ^ (1 << (row * 8 + col))
+        for square in IterateSquares(targets):
+            endRow, endCol = square >> 3, square & 7
+            if not self.IsSquareAttacked(endRow, endCol, enemyColor, occupied):
+                validMoves.append(Move((row, col), (endRow, endCol), self.board_array))
+
     '''
     Function to update the castle rights from a given move
     '''
@@ -779,13 +1193,14 @@ class GameState:
                 elif move.startCol == 7: # Right Rook
                     self.CurrentCastlingRights.BlackKSide = False
 
-        # Logic to check if the Rooks have been captured
-        if move.pieceCaptured == "wR":
+        # Logic to check if the Rooks have been captured (on their starting squares, any other rook there is one
+        # which got there later, e.g. by promotion, and capturing it doesn't change the rights of the other side)
+        if move.pieceCaptured == "wR" and move.endRow == 7:
             if move.endCol == 0: # Left rook
                 self.CurrentCastlingRights.WhiteQSide = False
             elif move.endCol == 7: # Right Rook
                 self.CurrentCastlingRights.WhiteKSide = False
-        elif move.pieceCaptured == "bR":
+        elif move.pieceCaptured == "bR" and move.endRow == 0:
             if move.endCol == 0: # Left rook
                 self.CurrentCastlingRights.BlackQSide = False
             elif move.endCol == 7: # Right Rook
@@ -795,24 +1210,29 @@ class GameState:
     Function which checks and generates valid Castle moves and the corresponding helper functions
     '''
     def GetCastleMoves(self, row, col, validMoves):
-        if self.SquareUnderAttack(row, col):
+        KingSide = self.CurrentCastlingRights.WhiteKSide if self.whiteToMove else self.CurrentCastlingRights.BlackKSide
+        QueenSide = self.CurrentCastlingRights.WhiteQSide if self.whiteToMove else self.CurrentCastlingRights.BlackQSide
+        if not KingSide and not QueenSide:
+            return # no castling rights left
+        if self.GetAttackMap('b' if self.whiteToMove else 'w') >> (row * 8 + col) & 1:
             return # Cuz we can't castle if in check
-        if (self.whiteToMove and self.CurrentCastlingRights.WhiteKSide) or (
-                not self.whiteToMove and self.CurrentCastlingRights.BlackKSide):
+        if KingSide:
             self.GetKingSideCastleMoves(row, col, validMoves)
-        if (self.whiteToMove and self.CurrentCastlingRights.WhiteQSide) or (
-                not self.whiteToMove and self.CurrentCastlingRights.BlackQSide):
+        if QueenSide:
             self.GetQueenSideCastleMoves(row, col, validMoves)
 
+    # the squares the king passes through are checked against the cached enemy attack map
     def GetKingSideCastleMoves(self, row, col, validMoves):
         if self.board_array[row, col + 1] == "--" and self.board_array[row, col + 2] == "--":
-            if not self.SquareUnderAttack(row, col + 1) and not self.SquareUnderAttack(row, col + 2):
+            attacked = self.GetAttackMap('b' if self.whiteToMove else 'w')
+            if not attacked >> (row * 8 + col + 1) & 1 and not attacked >> (row * 8 + col + 2) & 1:
                 validMoves.append(Move((row, col), (row, col + 2), self.board_array, IsCastleMove = True))
 
 
     def GetQueenSideCastleMoves(self, row, col, validMoves):
         if self.board_array[row, col - 1] == '--' and self.board_array[row, col - 2] == '--' and self.board_array[row, col - 3] == "--":
-            if not self.SquareUnderAttack(row, col - 1) and not self.SquareUnderAttack(row, col - 2):
+            attacked = self.GetAttackMap('b' if self.whiteToMove else 'w')
+            if not attacked >> (row * 8 + col - 1) & 1 and not attacked >> (row * 8 + col - 2) & 1:
                 validMoves.append(Move((row, col), (row, col - 2), self.board_array, IsCastleMove = True))
 
 '''
@@ -830,6 +1250,12 @@ Move Class containing all the logic regarding movement of the piece and not the
 '''
 
 class Move:
+    # Moves are created for every generated move, fixed slots instead of an instance dict make them smaller and faster
+    __slots__ = ("startRow", "startCol", "endRow", "endCol", "pieceMoved", "pieceCaptured", "PawnPromotion",
+                 "Pawn_Promoted_to", "EnPassant", "IsCastleMove", "IsCaptured", "disambiguate", "in_check",
+                 "is_checkmate", "moveID")
+    # code of the promotion piece in moveID
+    promotionCodes = {None: 0, "N": 1, "B": 2, "R": 3, "Q": 4}
     # mapping ranks and files to rows and columns
     ranksToRanks = {"1": 7, "2": 6, "3": 5, "4": 4,
                     "5": 3, "6": 2, "7": 1, "8": 0}
@@ -860,18 +1286,19 @@ class Move:
         self.disambiguate = ""
         self.in_check = False # Flag for check
         self.is_checkmate = False # Flag for checkmate
-        # Move ID for piece identification
-        self.moveID = self.startRow * 1000 + self.startCol * 100 + self.endRow * 10 + self.endCol  # Move ID to keep track of moves
+        # Move ID for piece identification, packed in 16 bits: start square (6 bits) | end square (6 bits) << 6 |
+        # promotion piece (3 bits) << 12 with squares as row * 8 + col. The AI's tables store moves by this int
+        self.moveID = (self.startRow * 8 + self.startCol) | (self.endRow * 8 + self.endCol) << 6 | \
+            self.promotionCodes[Promotion_Piece if self.PawnPromotion else None] << 12
 
     '''
-    Overriding the equals method
+    Overriding the equals method, the promotion piece is part of the moveID
     '''
     def __eq__(self, other):
-        if isinstance(other, Move):
-            if self.PawnPromotion:
-                return self.moveID == other.moveID and self.Pawn_Promoted_to == other.Pawn_Promoted_to
-            return self.moveID == other.moveID
-        return False
+        return isinstance(other, Move) and self.moveID == other.moveID
+
+    def __hash__(self):
+        return self.moveID
 
     '''
     Overriding the string method for Chess move notations
@@ -913,6 +1340,13 @@ class Move:
     def getRankFile(self, row, col):
         return self.colsToFiles[col] + self.rowsToRanks[row]
 
+    '''
+    Coordinate notation of the move as used by UCI engines: start and end square plus the promotion piece, "e7e8q"
+    '''
+    def GetUCI(self):
+        promotion = self.Pawn_Promoted_to.lower() if self.PawnPromotion and self.Pawn_Promoted_to else ""
+        return self.getRankFile(self.startRow, self.startCol) + self.getRankFile(self.endRow, self.endCol) + promotion
+
 '''
 Converting current game_state to FEN(Forsyth–Edwards Notation) string
 '''
@@ -0,0 +1,56 @@
+""" The EvaluationCache() class keeps the scores of positions already evaluated by the AI, so a position reached again
+(through transpositions, in the quiescence search or in the search of a later move of the same game) is not evaluated
+again. The evaluation only depends on where the pieces are, so entries are keyed by the Zobrist hash of the piece
+placement and stay valid for the whole game. The entries live in numpy arrays whose size is set by a memory budget in MB"""
+import numpy as np
+
+# Bytes of one entry: the 64-bit key and the 32-bit score
+ENTRY_SIZE = 12
+
+
+class EvaluationCache:
+    def __init__(self, size_mb):
+        self.Resize(size_mb)
+
+    '''
+    Allocates an empty cache using (at most) size_mb megabytes, each key has a single slot (direct-mapped)
+    '''
+    def Resize(self, size_mb):
+        self.size = max(1, int(size_mb * 1024 * 1024) // ENTRY_SIZE)
+        self.keys = np.zeros(self.size, dtype=np.uint64)  # key 0 marks an empty slot
+        self.scores = np.zeros(self.size, dtype=np.int32)
+        self.ResetStats()
+
+    def Clear(self):
+        self.keys.fill(0)
+        self.ResetStats()
+
+    def ResetStats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def HitRate(self):
+        probes = self.hits + self.misses
+        return self.hits / probes if probes else 0.0
+
+    def Stats(self):
+        return f"Eval cache hits: {self.hits}, misses: {self.misses}, hit rate: {self.HitRate() * 100:.1f}%"
+
+    '''
+    Returns the stored score of the position or None if it isn't in the cache
+    '''
+    def Probe(self, key):
+        index = key % self.size
+        if self.keys[index] == key:
+            self.hits += 1
+            return int(self.scores[index])
+        self.misses += 1
+        return None
+
+    '''
+    The slot always takes the last score stored in it
+    '''
+    def Store(self, key, score):
+        index = key % self.size
+        self.keys[index] = key
+        self.scores[index] = score
@@ -0,0 +1,131 @@
+""" Piece values and piece-square (influence) tables used to evaluate the board. They are kept apart from the AI so
+that GameState can keep the material and piece-square totals of the position up to date on every move.
+The influence tables come in a middlegame and an endgame version, the evaluation blends the two by the game phase"""
+import numpy as np
+
+# Piece Scores as per Chess rules
+pieceScore = {"K": 200, "Q": 9, "R": 5, "B": 3, "N": 3, "P": 1}
+
+# Game phase: every piece left on the board adds its weight, from MAX_PHASE with all the pieces (middlegame) down
+# to 0 with only kings and pawns (endgame)
+PHASE_WEIGHTS = {"K": 0, "Q": 4, "R": 2, "B": 1, "N": 1, "P": 0}
+MAX_PHASE = 24
+KING_SAFETY_PHASE = 7 # below this phase the kings come out and the pawn shield is no longer evaluated
+
+# defining piece influence value/weights for improved evaluation
+KnightScores = np.array([
+    [3, 10, 20, 20, 20, 20, 10, 3],
+    [10, 30, 40, 40, 40, 40, 30, 10],
+    [20, 40, 50, 55, 55, 50, 40, 20],
+    [20, 45, 55, 65, 65, 55, 45, 20],
+    [20, 45, 55, 65, 65, 55, 45, 20],
+    [20, 40, 50, 55, 55, 50, 40, 20],
+    [10, 30, 40, 40, 40, 40, 30, 10],
+    [3, 10, 20, 20, 20, 20, 10, 3]
+])
+
+BishopScores = np.array([
+    [10, 10, 10, 10, 10, 10, 10, 10],
+    [10, 20, 20, 20, 20, 20, 20, 10],
+    [10, 25, 30, 30, 30, 30, 25, 10],
+    [10, 25, 35, 40, 40, 35, 25, 10],
+    [10, 25, 40, 40, 40, 40, 25, 10],
+    [10, 30, 30, 30, 30, 30, 30, 10],
+    [10, 20, 25, 20, 20, 25, 20, 10],
+    [10, 10, 10, 10, 10, 10, 10, 10]
+])
+
+RookScores = np.array([
+    [10, 10, 10, 15, 15, 10, 10, 10],
+    [20, 20, 20, 20, 20, 20, 20, 20],
+    [5, 7, 10, 15, 15, 10, 7, 5],
+    [5, 7, 10, 10, 10, 10, 7, 5],
+    [5, 7, 10, 10, 10, 10, 7, 5],
+    [5, 7, 10, 15, 15, 10, 7, 5],
+    [20, 20, 20, 20, 20, 20, 20, 20],
+    [10, 10, 10, 15, 15, 10, 10, 10]
+])
+
+QueenScores = np.array([
+    [5, 10, 10, 15, 15, 10, 10, 5],
+    [10, 20, 25, 25, 25, 25, 20, 10],
+    [10, 25, 30, 35, 35, 30, 25, 10],
+    [15, 25, 35, 40, 40, 35, 25, 15],
+    [15, 25, 35, 40, 40, 35, 25, 15],
+    [10, 25, 30, 35, 35, 30, 25, 10],
+    [10, 20, 25, 25, 25, 25, 20, 10],
+    [5, 10, 10, 15, 15, 10, 10, 5]
+])
+
+KingScores = np.array([
+    [20, 30, 10, 5, 5, 10, 30, 20],
+    [10, 20, 5, 2, 2, 5, 20, 10],
+    [5, 10, 2, 2, 2, 2, 10, 5],
+    [1, 5, 1, 10, 10, 1, 5, 0],
+    [1, 5, 1, 10, 10, 1, 5, 0],
+    [5, 10, 2, 2, 2, 2, 10, 5],
+    [10, 20, 5, 2, 2, 5, 20, 10],
+    [20, 30, 10, 5, 5, 10, 30, 20]
+])
+
+WhitePawnScores = np.array([
+    [50, 50, 50, 50, 50, 50, 50, 50],# promotion incentive
+    [40, 40, 40, 40, 40, 40, 40, 40],
+    [30, 30, 35, 35, 35, 35, 30, 30],
+    [20, 20, 25, 30, 30, 25, 20, 20],
+    [10, 10, 15, 25, 25, 15, 10, 10],
+    [5, 5, 10, 15, 15, 10, 5, 5],
+    [0, 0, 0, 0, 0, 0, 0, 0],         # starting position
+    [0, 0, 0, 0, 0, 0, 0, 0]
+])
+
+
+BlackPawnScores = np.array([
+    [0, 0, 0, 0, 0, 0, 0, 0],
+    [0, 0, 0, 0, 0, 0, 0, 0],        # starting position
+    [5, 5, 10, 15, 15, 10, 5, 5],
+    [10, 10, 15, 25, 25, 15, 10, 10],
+    [20, 20, 25, 30, 30, 25, 20, 20],
+    [30, 30, 35, 35, 35, 35, 30, 30],
+    [40, 40, 40, 40, 40, 40, 40, 40],
+    [50, 50, 50, 50, 50, 50, 50, 50]  # promotion incentive
+])
+
+# Endgame influence: the king belongs in the centre and pawns get much more valuable the closer they are to promoting
+KingEndgameScores = np.array([
+    [0, 5, 10, 15, 15, 10, 5, 0],
+    [5, 15, 20, 25, 25, 20, 15, 5],
+    [10, 20, 30, 35, 35, 30, 20, 10],
+    [15, 25, 35, 40, 40, 35, 25, 15],
+    [15, 25, 35, 40, 40, 35, 25, 15],
+    [10, 20, 30, 35, 35, 30, 20, 10],
+    [5, 15, 20, 25, 25, 20, 15, 5],
+    [0, 5, 10, 15, 15, 10, 5, 0]
+])
+
+WhitePawnEndgameScores = np.array([
+    [100, 100, 100, 100, 100, 100, 100, 100],
+    [80, 80, 80, 80, 80, 80, 80, 80],
+    [60, 60, 60, 60, 60, 60, 60, 60],
+    [40, 40, 40, 40, 40, 40, 40, 40],
+    [25, 25, 25, 25, 25, 25, 25, 25],
+    [10, 10, 10, 10, 10, 10, 10, 10],
+    [0, 0, 0, 0, 0, 0, 0, 0],         # starting position
+    [0, 0, 0, 0, 0, 0, 0, 0]
+])
+
+BlackPawnEndgameScores = WhitePawnEndgameScores[::-1]
+
+Piece_Influence_Scores = {"N" : KnightScores, "B": BishopScores, "R": RookScores, "Q": QueenScores,
+                          "K": KingScores, "wP": WhitePawnScores, "bP": BlackPawnScores }
+
+# the minor and major pieces use the same table in both phases
+Piece_Endgame_Influence_Scores = {**Piece_Influence_Scores, "K": KingEndgameScores, "wP": WhitePawnEndgameScores,
+                                  "bP": BlackPawnEndgameScores}
+
+# Flattened copies of the influence tables for every piece, indexed by bitboard square (row * 8 + col) as plain lists
+# since indexing a python list is much faster than indexing a numpy array with scalars
+Piece_Square_Influence = {piece: Piece_Influence_Scores[piece if piece[1] == "P" else piece[1]].flatten().tolist()
+                          for piece in ("wP", "wN", "wB", "wR", "wQ", "wK", "bP", "bN", "bB", "bR", "bQ", "bK")}
+Piece_Square_Endgame_Influence = {piece: Piece_Endgame_Influence_Scores[piece if piece[1] == "P" else piece[1]].flatten().tolist()
+                                  for piece in Piece_Square_Influence}
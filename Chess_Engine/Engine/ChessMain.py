@@ -2,9 +2,8 @@
 Main driver file. The file will be handling user move input and display current game state object
 """
 import pygame as pyg
-import ChessEngine, ChessAI
-from multiprocessing import Process, Queue
-import sys, os
+import ChessEngine, ChessAI, ChessAIWorker
+import sys, os, time
 
 # Constants for Chess Board and Move Log Panel
 BOARD_WIDTH = BOARD_HEIGHT = 640
@@ -13,8 +12,13 @@ MOVE_LOG_PANEL_HEIGHT = BOARD_HEIGHT
 BOARD_DIMENSION = 8  #  dimensions of the chess board
 SQUARE_SIZE = BOARD_HEIGHT // BOARD_DIMENSION  # size of each square on the board
 MAX_FPS = 30  # game loop frequency and animation cycles
+AI_TIME_LIMIT_MS = 5000  # time the AI gets to find its best move
+AI_TIME_GRACE_MS = 1000  # extra time before an AI search that didn't answer is stopped, and again before it is restarted
+AI_PONDER = True  # in Player vs AI the AI searches the reply it expects while the human thinks
+AI_WORKERS = 1  # processes searching each AI move, more than one searches in parallel (see ChessAI.PARALLEL_MODE)
 PIECE_IMAGES = {}
-global colors, game_mode, HEADER_HEIGHT, manual_scroll, return_queue # some global constants used
+global colors, game_mode, HEADER_HEIGHT, manual_scroll, engine # some global constants used
+engine = None # AI process (ChessAIWorker.EngineProcess) started once and kept for every game
 # scroll variables
 MOVE_LOG_SCROLL_OFFSET = 0
 MOVE_LOG_SCROLL_SPEED = 50 # Pixels per scroll step
@@ -227,9 +231,12 @@ Main driver code to handle user move input and update the graphics according to
 
 
 def main():
-    global MOVE_LOG_SCROLL_OFFSET, manual_scroll, HEADER_HEIGHT, return_queue
+    global MOVE_LOG_SCROLL_OFFSET, manual_scroll, HEADER_HEIGHT, engine
     # Intro screen rendering and selections
     player_color, board_colors, selected_game_mode = IntroScreen()
+    if engine is None or not engine.IsAlive():
+        engine = ChessAIWorker.EngineProcess()
+        engine.SetOption("Workers", AI_WORKERS)
 
     # Main game loop
     pyg.init()
@@ -252,7 +259,8 @@ def main():
     Human = False # Flag to indicate if the human is playing with white, False if AI is playing
     P2_AI = False # Same as above flag but for AI
     AI_Thinking = False # flag to indicate if Chess AI is thinking
-    MoveFinderProcess = None
+    AI_Stopped = False # flag to indicate the AI search overran and was asked to stop
+    AI_Deadline = None # time by which the AI has to answer
     # For 2 AIs this will be True and False
     # Setting Human and P2_AI flags based on game mode and player color
     if selected_game_mode == "Player vs Player":
@@ -330,9 +338,8 @@ def main():
                     moveMade = True
                     animate = False
                     gameOver = False
-                    if AI_Thinking:
-                        MoveFinderProcess.terminate()
-                        AI_Thinking = False
+                    engine.Stop() # searching or pondering the position before the undo, the answer is dropped
+                    AI_Thinking = False
                     moveUndone = True
 
                 if event.key == pyg.K_r: # Reset the game by setting the game state to default
@@ -343,14 +350,17 @@ def main():
                     moveMade = False
                     animate = False
                     gameOver = False
-                    if AI_Thinking:
-                        MoveFinderProcess.terminate()
-                        AI_Thinking = False
+                    engine.Stop()
+                    AI_Thinking = False
                     moveUndone = True
 
+                if event.key == pyg.K_m and AI_Thinking and not AI_Stopped: # AI moves now with the best move found so far
+                    engine.Stop()
+                    AI_Stopped = True
+                    AI_Deadline = time.time() + AI_TIME_GRACE_MS / 1000
+
                 if event.key == pyg.K_q: # Reset to Intro Screen and starting again
-                    if AI_Thinking:
-                        MoveFinderProcess.terminate()
+                    engine.Stop()
                     main()
 
 
@@ -358,21 +368,40 @@ def main():
         if not gameOver and not human_turn and not moveUndone:
             if not AI_Thinking:
                 AI_Thinking = True
+                AI_Stopped = False
                 print("Thinking.....")
-                return_queue = Queue() # container for values withing threads, used to pass data within threads
-                MoveFinderProcess = Process(target=ChessAI.FindBestMove_NegaMax_AB_Pruning, args=(game_state, validMoves, return_queue)) # target is the function we want to call
-                MoveFinderProcess.start() # Call FindBestMove_NegaMax_AB_Pruning(game_state, validMoves, return_queue), return_queue will return the data
-
-            # checking for the process now
-            if not MoveFinderProcess.is_alive(): # when process is no longer alive
+                # only the moves of the game go to the engine process, which keeps its search tables between moves
+                # (and carries on with its ponder search if the human played the expected reply)
+                engine.Search(game_state, AI_TIME_LIMIT_MS)
+                AI_Deadline = time.time() + (AI_TIME_LIMIT_MS + AI_TIME_GRACE_MS) / 1000
+
+            # checking for the answer now, the search stops itself at the time limit but is asked to stop if it overruns
+            AI_Answered, AI_Move = engine.Poll()
+            if not AI_Answered and (time.time() > AI_Deadline or not engine.IsAlive()):
+                if engine.IsAlive() and not AI_Stopped:
+                    engine.Stop() # it answers with the best move found so far
+                    AI_Stopped = True
+                    AI_Deadline = time.time() + AI_TIME_GRACE_MS / 1000
+                else: # the engine process is stuck or gone, a new one takes over
+                    if engine.IsAlive():
+                        print(f"AI engine didn't answer the stop within {AI_TIME_GRACE_MS} ms, starting a new engine process (random move played)")
+                    else:
+                        print(f"AI engine process exited (exit code {engine.process.exitcode}), starting a new one (random move played)")
+                    engine.Quit()
+                    engine = ChessAIWorker.EngineProcess()
+                    engine.SetOption("Workers", AI_WORKERS)
+                    AI_Answered = True
+            if AI_Answered:
                 # print("Done Thinking")
-                AI_Move = return_queue.get() # to get the move after process is done
+                AI_Move = game_state.ParseMove(AI_Move) if AI_Move is not None else None
                 if AI_Move is None:
                     AI_Move = ChessAI.RandomChessMove(validMoves)
                 game_state.MakeMove(AI_Move)
                 moveMade = True
                 animate = True
                 AI_Thinking = False
+                if AI_PONDER and Human == P2_AI: # Player vs AI, thinking on the human's time
+                    engine.Ponder(game_state, AI_TIME_LIMIT_MS)
 
         if moveMade:  #checking so that when move is undone and new set of moves are generated
             if animate:
@@ -393,7 +422,7 @@ def main():
 
         # Update the screen with the current game state and move log
         DrawGameState(screen, game_state, validMoves, square_selected, board_colors)
-        DrawMoveLog(screen, game_state,MoveLogFont, Human, P2_AI)
+        DrawMoveLog(screen, game_state,MoveLogFont, Human, P2_AI, engine.info if AI_Thinking else None)
 
         # Checking EndGameStatus like checkmate, stalemate, Material count, 3-fold repetition
         # and fifty move draw to see if the game is over
@@ -577,7 +606,7 @@ def DrawEndGameText(screen, text):
 '''
 Function to draw move log next to the board
 '''
-def DrawMoveLog(screen, game_state, font, Human_Flag, AI_Flag):
+def DrawMoveLog(screen, game_state, font, Human_Flag, AI_Flag, AI_Info=None):
     global game_mode, MOVE_LOG_SCROLL_OFFSET
     header_font = pyg.font.SysFont("Arial", 26, bold=True)
     info_font = pyg.font.SysFont("Arial",20, bold=True)
@@ -603,6 +632,8 @@ def DrawMoveLog(screen, game_state, font, Human_Flag, AI_Flag):
     turn = "White to Move" if game_state.whiteToMove else "Black to Move"
     move_count = len(game_state.moveLog) // 2 + 1
     info_str1 = "Move History"
+    if AI_Info is not None: # live thinking of the AI: last finished iteration of its search
+        info_str1 = f"AI: depth {AI_Info['depth']}, score {AI_Info['score']}, {AI_Info['nps'] // 1000}k nps"
     info_str2 = f"| {game_mode} | {turn} |"
     info_str3 = f"Move {move_count}"
     # Rendering Info Lines
@@ -639,6 +670,14 @@ def DrawMoveLog(screen, game_state, font, Human_Flag, AI_Flag):
 
         y_axis += line_height # Move next row
 
+    # principal variation of the AI's search at the bottom of the panel while it thinks
+    if AI_Info is not None:
+        pv_font = pyg.font.SysFont("Arial", 16)
+        pv_rect = pyg.Rect(BOARD_WIDTH, MOVE_LOG_PANEL_HEIGHT - pv_font.get_height() - 6, MOVE_LOG_PANEL_WIDTH, pv_font.get_height() + 6)
+        pyg.draw.rect(screen, pyg.Color('#1d1c1a'), pv_rect)
+        pv_text = "PV: " + " ".join(AI_Info["pv"]) + f" ({AI_Info['nodes']} nodes)"
+        screen.blit(pv_font.render(pv_text, True, pyg.Color("white")), (BOARD_WIDTH + 5, pv_rect.y + 3))
+
 '''
 Function to set custom board configuration using FEN notation
 '''
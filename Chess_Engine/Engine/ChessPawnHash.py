@@ -0,0 +1,52 @@
+""" The PawnHashTable() class caches the evaluation of pawn structures. The pawns move much less often than the other
+pieces, so most positions searched by the AI share their pawn structure with positions evaluated before. Entries are
+keyed by the pawn hash of the bitboards (Zobrist keys of the pawns only) and the table holds a fixed number of them"""
+
+class PawnHashTable:
+    '''
+    size -> number of entries, rounded down to a power of two so the index is a mask of the key
+    '''
+    def __init__(self, size):
+        self.Resize(size)
+
+    def Resize(self, size):
+        self.size = 1 << max(0, int(size).bit_length() - 1)
+        self.mask = self.size - 1
+        self.keys = [None] * self.size  # None marks an empty slot, 0 is the key of a position without pawns
+        self.entries = [None] * self.size
+        self.ResetStats()
+
+    def Clear(self):
+        self.keys = [None] * self.size
+        self.entries = [None] * self.size
+        self.ResetStats()
+
+    def ResetStats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def HitRate(self):
+        probes = self.hits + self.misses
+        return self.hits / probes if probes else 0.0
+
+    def Stats(self):
+        return f"Pawn hash hits: {self.hits}, misses: {self.misses}, hit rate: {self.HitRate() * 100:.1f}%"
+
+    '''
+    Returns the entry stored for the pawn structure or None if it isn't in the table
+    '''
+    def Probe(self, key):
+        index = key & self.mask
+        if self.keys[index] == key:
+            self.hits += 1
+            return self.entries[index]
+        self.misses += 1
+        return None
+
+    '''
+    Each slot keeps the last pawn structure stored in it (always-replace)
+    '''
+    def Store(self, key, entry):
+        index = key & self.mask
+        self.keys[index] = key
+        self.entries[index] = entry
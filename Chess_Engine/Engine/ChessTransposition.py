@@ -0,0 +1,153 @@
+""" The TranspositionTable() class stores the results of positions already searched by the AI, keyed by the Zobrist
+position key of GameState, so a position reached again through a different move order doesn't have to be searched from
+scratch. The entries live in a single numpy array whose size is set by a memory budget in MB.
+SharedTranspositionTable() keeps the array in shared memory, for several search processes filling the same table"""
+from multiprocessing import shared_memory
+import numpy as np
+
+# Bound type of a stored score (0 marks an empty entry)
+EXACT = 1  # the score is the exact value of the position
+LOWER_BOUND = 2  # the search failed high (beta cutoff), the position is worth at least the score
+UPPER_BOUND = 3  # the search failed low, the position is worth at most the score
+
+# Layout of one entry, 17 bytes. The move is the 16-bit moveID of the best move (see ChessEngine.Move),
+# 0 is never a legal move (a8 to a8) so it is used for "no move"
+TT_ENTRY = np.dtype([("key", np.uint64), ("score", np.int32), ("move", np.uint16), ("depth", np.int8),
+                     ("flag", np.uint8), ("age", np.uint8)])
+
+
+class TranspositionTable:
+    '''
+    size_mb -> memory budget of the table
+    mate_threshold -> scores above it (or below -mate_threshold) are mate scores which need ply adjustment
+    '''
+    def __init__(self, size_mb, mate_threshold):
+        self.mate_threshold = mate_threshold
+        self.age = 0
+        self.Resize(size_mb)
+
+    '''
+    Allocates an empty table using (at most) size_mb megabytes. Entries are grouped in buckets of two:
+    the first slot keeps the deepest search of the positions landing in the bucket (depth-preferred),
+    the second slot takes every other result (always-replace) so recent positions are still found
+    '''
+    def Resize(self, size_mb):
+        self.bucket_count = max(1, int(size_mb * 1024 * 1024) // (2 * TT_ENTRY.itemsize))
+        self.table = self.AllocateTable(self.bucket_count * 2)
+        # views on each field, indexing a plain array is faster than indexing the structured one
+        self.keys = self.table["key"]
+        self.scores = self.table["score"]
+        self.moves = self.table["move"]
+        self.depths = self.table["depth"]
+        self.flags = self.table["flag"]
+        self.ages = self.table["age"]
+        self.ResetStats()
+
+    def AllocateTable(self, entries):
+        return np.zeros(entries, dtype=TT_ENTRY)
+
+    def Clear(self):
+        self.table.fill(0)
+        self.age = 0
+        self.ResetStats()
+
+    '''
+    Called at the start of every search, entries from older searches can then be replaced in the depth-preferred slot
+    '''
+    def NewSearch(self):
+        self.age = (self.age + 1) & 0xFF
+        self.ResetStats()
+
+    def ResetStats(self):
+        self.hits = 0
+        self.misses = 0
+        self.overwrites = 0  # stores which replaced the entry of another position
+
+    def Stats(self):
+        return f"TT hits: {self.hits}, misses: {self.misses}, overwrites: {self.overwrites}"
+
+    '''
+    Mate scores are stored relative to the node (distance to mate from here) instead of relative to the root,
+    so the same entry gives the correct mate distance when the position is reached at another ply
+    '''
+    def ScoreToTable(self, score, ply):
+        if score > self.mate_threshold:
+            return score + ply
+        if score < -self.mate_threshold:
+            return score - ply
+        return score
+
+    def ScoreFromTable(self, score, ply):
+        if score > self.mate_threshold:
+            return score - ply
+        if score < -self.mate_threshold:
+            return score + ply
+        return score
+
+    '''
+    Returns (depth, score, flag, move) of the stored position or None if the position isn't in the table
+    '''
+    def Probe(self, key, ply):
+        index = (key % self.bucket_count) * 2
+        keys = self.keys
+        if keys[index] != key:
+            index += 1
+            if keys[index] != key:
+                self.misses += 1
+                return None
+        if not self.flags[index]:  # empty entry of the position with key 0
+            self.misses += 1
+            return None
+        self.hits += 1
+        return (int(self.depths[index]), self.ScoreFromTable(int(self.scores[index]), ply), int(self.flags[index]),
+                int(self.moves[index]))
+
+    def Store(self, key, depth, score, flag, move, ply):
+        index = (key % self.bucket_count) * 2
+        # the depth-preferred slot is only replaced by the same position, an equal or deeper search or when stale
+        if not (self.keys[index] == key or depth >= self.depths[index] or self.ages[index] != self.age
+                or not self.flags[index]):
+            index += 1
+        if self.flags[index] and self.keys[index] != key:
+            self.overwrites += 1
+        self.scores[index] = self.ScoreToTable(score, ply)
+        self.moves[index] = move
+        self.depths[index] = depth
+        self.flags[index] = flag
+        self.ages[index] = self.age
+        self.keys[index] = key  # last, so another process sharing the table rarely finds the key with the old data
+
+
+class SharedTranspositionTable(TranspositionTable):
+    '''
+    Transposition table in a multiprocessing.shared_memory block, every process attached to it reads and writes the
+    same entries. name=None creates a new empty table (the creator unlinks it on Close()), otherwise the table created
+    under that name is attached, size_mb must then be the size it was created with.
+    There is no locking: two processes writing the same entry at once can leave it mixed, the search only uses a
+    stored move for ordering so the worst case is a wrong score for one position, which Lazy SMP engines accept
+    '''
+    def __init__(self, size_mb, mate_threshold, name=None):
+        self.owner = name is None
+        self.name = name
+        super().__init__(size_mb, mate_threshold)
+
+    def AllocateTable(self, entries):
+        if self.owner:
+            self.shared_memory = shared_memory.SharedMemory(create=True, size=entries * TT_ENTRY.itemsize)
+            self.name = self.shared_memory.name
+        else:
+            self.shared_memory = shared_memory.SharedMemory(name=self.name)
+        table = np.ndarray(entries, dtype=TT_ENTRY, buffer=self.shared_memory.buf)
+        if self.owner:
+            table.fill(0)
+        return table
+
+    '''
+    Detaches from the shared memory (and frees it when this process created it), the table can't be used afterwards
+    '''
+    def Close(self):
+        # the arrays on the buffer have to go before the shared memory can be closed
+        self.table = self.keys = self.scores = self.moves = self.depths = self.flags = self.ages = None
+        self.shared_memory.close()
+        if self.owner:
+            self.shared_memory.unlink()
@@ -0,0 +1,26 @@
+""" Zobrist keys used to hash positions into a single 64-bit integer. The random numbers and their layout are the ones
+of the Polyglot opening book format, so GameState.position_key can be looked up in a Polyglot book directly"""
+from chess.polyglot import POLYGLOT_RANDOM_ARRAY
+
+# Polyglot numbers the pieces as black pawn 0, white pawn 1, black knight 2, ... white king 11
+POLYGLOT_PIECE_KINDS = {"bP": 0, "wP": 1, "bN": 2, "wN": 3, "bB": 4, "wB": 5,
+                        "bR": 6, "wR": 7, "bQ": 8, "wQ": 9, "bK": 10, "wK": 11}
+
+# Key of every piece on every square, indexed by our (row * 8 + col) square. Polyglot counts squares from a1 (row 7)
+PIECE_KEYS = {piece: [POLYGLOT_RANDOM_ARRAY[64 * kind + (7 - (square >> 3)) * 8 + (square & 7)] for square in range(64)]
+              for piece, kind in POLYGLOT_PIECE_KINDS.items()}
+
+# Key of every combination of castling rights, indexed by the mask from CastlingRightsIndex()
+CASTLING_KEYS = []
+for castling_index in range(16):
+    castling_key = 0
+    for right in range(4): # White King side, White Queen side, Black King side, Black Queen side
+        if castling_index >> right & 1:
+            castling_key ^= POLYGLOT_RANDOM_ARRAY[768 + right]
+    CASTLING_KEYS.append(castling_key)
+
+EN_PASSANT_KEYS = [POLYGLOT_RANDOM_ARRAY[772 + col] for col in range(8)] # by file (col) of the en passant square
+WHITE_TO_MOVE_KEY = POLYGLOT_RANDOM_ARRAY[780]
+
+def CastlingRightsIndex(castle_rights):
+    return castle_rights.WhiteKSide | castle_rights.WhiteQSide << 1 | castle_rights.BlackKSide << 2 | castle_rights.BlackQSide << 3
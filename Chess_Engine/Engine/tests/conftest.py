@@ -0,0 +1,5 @@
+# The engine modules import each other as top level modules (they are run from the Engine folder)
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,109 @@
+""" The engine process driven through EngineProcess, the way ChessMain uses it"""
+import time
+import pytest
+import ChessAI
+from ChessEngine import GameState
+from ChessAIWorker import EngineProcess, Set_Option
+
+KIWIPETE = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"  # not in the opening book
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    # an empty opening book (the book file isn't part of the repository), the engine process is forked with it
+    book_path = tmp_path / "empty.bin"
+    book_path.write_bytes(b"")
+    monkeypatch.setattr(ChessAI, "_book_path", str(book_path))
+    monkeypatch.setattr(ChessAI, "_book", None)
+    engine = EngineProcess()
+    yield engine
+    engine.Quit()
+
+
+def WaitForAnswer(engine, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        answered, move = engine.Poll()
+        if answered:
+            return move
+        time.sleep(0.01)
+    pytest.fail("the engine didn't answer")
+
+
+def test_stop_during_go_returns_a_legal_move(engine):
+    game_state = GameState()
+    game_state.LoadFEN(KIWIPETE)
+    engine.SetPosition(game_state)
+    engine.Go(60000)
+    time.sleep(0.5)
+    stopped = time.time()
+    engine.Stop()
+    move = WaitForAnswer(engine)
+    assert time.time() - stopped < 2
+    assert game_state.ParseMove(move) is not None
+
+
+def PonderMove(engine, game_state):
+    # the reply the last search expects, or any reply when its principal variation ended with its move
+    if engine.ponder_move is None:
+        engine.ponder_move = game_state.GetValidMoves()[0].GetUCI()
+    return engine.ponder_move
+
+
+def test_position_go_ponderhit_and_quit(engine):
+    game_state = GameState()
+    game_state.LoadFEN(KIWIPETE)
+    engine.SetPosition(game_state)
+    engine.Go(500)
+    move = game_state.ParseMove(WaitForAnswer(engine))
+    assert move is not None
+    game_state.MakeMove(move)
+
+    # the human thinks longer than the AI's time and plays the expected reply: the time pondered counts
+    reply = PonderMove(engine, game_state)
+    engine.Ponder(game_state, 1000)
+    time.sleep(1.5)
+    game_state.MakeMove(game_state.ParseMove(reply))
+    hit = time.time()
+    engine.Search(game_state, 1000)
+    move = game_state.ParseMove(WaitForAnswer(engine))
+    assert time.time() - hit < 0.6
+    assert move is not None
+    game_state.MakeMove(move)
+
+    # another reply: pondering is stopped and the real position searched
+    expected = PonderMove(engine, game_state)
+    engine.Ponder(game_state, 1000)
+    time.sleep(0.2)
+    other = next(reply for reply in game_state.GetValidMoves() if reply.GetUCI() != expected)
+    game_state.MakeMove(other)
+    engine.Search(game_state, 300)
+    assert game_state.ParseMove(WaitForAnswer(engine)) is not None
+
+    engine.Quit()
+    assert not engine.IsAlive()
+
+
+def test_setoption(monkeypatch):
+    monkeypatch.setattr(ChessAI, "WORKERS", 1)
+    monkeypatch.setattr(ChessAI, "PARALLEL_MODE", "lazy_smp")
+    Set_Option("name Workers value 3".split())
+    Set_Option("name ParallelMode value root_split".split())
+    assert (ChessAI.WORKERS, ChessAI.PARALLEL_MODE) == (3, "root_split")
+    with pytest.raises(ValueError):
+        Set_Option("name ParallelMode value threads".split())
+
+
+@pytest.mark.parametrize("parallel_mode", ["lazy_smp", "root_split"])
+def test_go_with_parallel_search(engine, parallel_mode):
+    # the engine process starts the processes of the parallel search itself
+    game_state = GameState()
+    game_state.LoadFEN(KIWIPETE)
+    engine.SetOption("Workers", 2)
+    engine.SetOption("ParallelMode", parallel_mode)
+    engine.SetPosition(game_state)
+    engine.Go(1000)
+    assert game_state.ParseMove(WaitForAnswer(engine)) is not None
+    assert engine.IsAlive()
+    engine.Quit()
+    assert not engine.IsAlive()
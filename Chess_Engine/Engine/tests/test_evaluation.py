@@ -0,0 +1,86 @@
+""" The fast evaluation paths against the slow ones they replace: the single pass coordination terms against the
+reference board scans, the incrementally kept totals against a full recompute and the NumPy batch evaluator against
+BoardScore()"""
+import random
+import numpy as np
+import pytest
+from ChessEngine import GameState
+from ChessBitboard import PIECES
+from ChessBatchEvaluation import BatchEvaluate, BitboardsToPlanes, EncodeBoardArray, BatchScoreMoves
+import ChessAI
+
+FENS = [
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+    "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+    "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+    "2r2rk1/pp3ppp/2n1b3/3pP3/3N4/2P1B3/P4PPP/R4RK1 b - - 0 1",  # connected rooks, knight in the centre
+    "6k1/5ppp/8/8/8/8/5PPP/R3R1K1 w - - 0 1",  # rooks on open files
+]
+GAMES = 4  # random games played from each position
+PLIES = 40
+
+
+def RandomPositions(debug_evaluation=False):
+    # game states of seeded random games, yielded after every move (the same object, moved on after each yield)
+    rng = random.Random(12)
+    for fen in FENS:
+        for _ in range(GAMES):
+            game_state = GameState(debug_evaluation=debug_evaluation)
+            game_state.LoadFEN(fen)
+            for _ in range(PLIES):
+                moves = game_state.GetValidMoves()
+                if not moves:
+                    break
+                game_state.MakeMove(rng.choice(moves), search=True)
+                game_state.GetValidMoves()  # sets the checkmate and stalemate flags BoardScore() looks at
+                yield game_state
+
+
+def test_coordination_terms_match_reference():
+    for game_state in RandomPositions():
+        terms = ChessAI.Coordination_Terms(game_state)
+        expected = [reference(game_state) for reference in ChessAI.Coordination_Reference_Functions()]
+        assert list(terms) == expected, game_state.game_state_to_fen()
+
+
+def test_incremental_evaluation_totals():
+    # debug_evaluation makes every MakeMove() and UndoMove() check the totals, which raises when they are out of sync
+    positions = 0
+    for game_state in RandomPositions(debug_evaluation=True):
+        for move in game_state.GetValidMoves()[:4]:
+            game_state.MakeMove(move, search=True)
+            game_state.UndoMove(search=True)
+        game_state.CheckIncrementalEvaluation()
+        positions += 1
+    assert positions > 0
+
+
+def test_batch_evaluation_matches_board_score():
+    # BatchEvaluate() leaves out connected rooks (term 4) and the checkmate and stalemate scores
+    piece_bitboards, board_codes, expected = [], [], []
+    for game_state in RandomPositions():
+        if game_state.Checkmate or game_state.Stalemate:
+            continue
+        piece_bitboards.append([game_state.bitboards.pieces[piece] for piece in PIECES])
+        board_codes.append(EncodeBoardArray(game_state.board_array))
+        expected.append(ChessAI.BoardScore(game_state) - ChessAI.Coordination_Terms(game_state)[4])
+    planes = BitboardsToPlanes(piece_bitboards)
+    expected = np.array(expected)
+    assert (BatchEvaluate(planes) == expected).all()
+    assert (BatchEvaluate(planes.reshape(-1, 12, 8, 8)) == expected).all()
+    assert (BatchEvaluate(np.array(board_codes)) == expected).all()
+
+
+@pytest.mark.parametrize("fen", FENS[:2])
+def test_batch_score_moves(fen):
+    game_state = GameState()
+    game_state.LoadFEN(fen)
+    moves = game_state.GetValidMoves()
+    expected = []
+    for move in moves:
+        game_state.MakeMove(move, search=True)
+        expected.append(ChessAI.BoardScore(game_state) - ChessAI.Coordination_Terms(game_state)[4])
+        game_state.UndoMove(search=True)
+    assert list(BatchScoreMoves(game_state, moves)) == expected
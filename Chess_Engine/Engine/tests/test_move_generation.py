@@ -0,0 +1,75 @@
+""" Perft (number of leaf nodes of the legal move tree) of well known test positions, for the bitboard and the board
+array move generators. Any wrong or missing move changes the count"""
+import pytest
+from ChessEngine import GameState
+
+# (FEN, node counts at depth 1, 2, 3)
+PERFT_POSITIONS = [
+    ("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", [20, 400, 8902]),  # starting position
+    ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", [48, 2039, 97862]),  # Kiwipete
+    ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", [14, 191, 2812]),
+    ("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", [6, 264, 9467]),
+    ("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", [44, 1486, 62379]),
+    ("r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10", [46, 2079, 89890]),
+    # en passant capture of the checking pawn, en passant out of check and a pinned pawn
+    ("8/8/8/1Pp5/1K6/8/8/7k w - c6 0 2", [8, 29, 182]),
+    ("8/8/8/2pP4/1K6/8/8/7k w - c6 0 2", [9, 33, 223]),
+    ("4k3/8/8/8/1b6/8/3P4/4K3 w - - 0 1", [4, 52, 398]),
+    # en passant leaving the king in check along the rank, with the rook or the king on the edge of the board
+    ("8/8/2pp4/KP5r/R3Pp1k/8/6P1/8 b - e3 0 2", [16, 191, 2994]),
+    ("8/8/8/K2pP2r/8/8/8/7k w - d6 0 2", [6, 78, 528]),
+    ("8/8/8/r2pP2K/8/8/8/7k w - d6 0 2", [6, 78, 547]),
+    # capturing the rook promoted on a1 doesn't take black's castling rights
+    ("r3k2r/Pppp1ppp/1b3nbN/nPP5/BB2P3/q4N2/P2P2PP/r2Q1RK1 w kq - 0 2", [33, 1344, 46000]),
+]
+
+
+def Perft(game_state, depth, search=True):
+    moves = game_state.GetValidMoves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        game_state.MakeMove(move, search=search)
+        nodes += Perft(game_state, depth - 1, search)
+        game_state.UndoMove(search=search)
+    return nodes
+
+
+def LoadGameState(fen, use_bitboards):
+    game_state = GameState(use_bitboards=use_bitboards)
+    game_state.LoadFEN(fen)
+    return game_state
+
+
+@pytest.mark.parametrize("use_bitboards", [True, False], ids=["bitboards", "board_array"])
+@pytest.mark.parametrize("fen, counts", PERFT_POSITIONS)
+def test_perft(fen, counts, use_bitboards):
+    game_state = LoadGameState(fen, use_bitboards)
+    assert Perft(game_state, 3) == counts[2]
+    # the position is restored after the search
+    assert game_state.game_state_to_fen().split()[:4] == fen.split()[:4]
+
+
+@pytest.mark.parametrize("use_bitboards", [True, False], ids=["bitboards", "board_array"])
+@pytest.mark.parametrize("fen, counts", PERFT_POSITIONS[:2])
+def test_perft_played_moves(fen, counts, use_bitboards):
+    # moves made outside the search also update the notation flags and the position history
+    game_state = LoadGameState(fen, use_bitboards)
+    assert Perft(game_state, 2, search=False) == counts[1]
+    assert game_state.position_history == {game_state.position_key: 1}
+
+
+@pytest.mark.parametrize("use_bitboards", [True, False], ids=["bitboards", "board_array"])
+@pytest.mark.parametrize("fen, counts", PERFT_POSITIONS)
+def test_gives_check(fen, counts, use_bitboards):
+    # GivesCheck() without making the move agrees with making it, two plies deep
+    game_state = LoadGameState(fen, use_bitboards)
+    for move in game_state.GetValidMoves():
+        game_state.MakeMove(move, search=True)
+        for reply in game_state.GetValidMoves():
+            gives_check = game_state.GivesCheck(reply)
+            game_state.MakeMove(reply, search=True)
+            assert gives_check == game_state.inCheck(), reply.GetUCI()
+            game_state.UndoMove(search=True)
+        game_state.UndoMove(search=True)
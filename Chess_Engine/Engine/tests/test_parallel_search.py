@@ -0,0 +1,67 @@
+""" The parallel searches: the game sent to the search processes and the processes kept from move to move"""
+import ChessAI
+from ChessEngine import GameState
+
+OPENING = ["e2e4", "e7e5", "g1f3", "b8c6", "f1b5", "a7a6"]
+
+
+def PlayedGame(moves, fen=None):
+    game_state = GameState()
+    if fen is not None:
+        game_state.LoadFEN(fen)
+    for text in moves:
+        game_state.MakeMove(game_state.ParseMove(text))
+    return game_state
+
+
+def test_game_position_round_trip():
+    # loading the games of one move after another (and one taking a move back) gives the game's own position
+    for length in [2, 3, 6, 4]:
+        game_state = PlayedGame(OPENING[:length])
+        loaded = ChessAI.Load_Game_Position(ChessAI.Game_Position(game_state))
+        assert loaded.game_state_to_fen() == game_state.game_state_to_fen()
+        assert loaded.position_history == game_state.position_history
+    fen = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+    game_state = PlayedGame(["e1g1", "h3g2"], fen)
+    loaded = ChessAI.Load_Game_Position(ChessAI.Game_Position(game_state))
+    assert loaded.game_state_to_fen() == game_state.game_state_to_fen()
+
+
+def test_lazy_smp_keeps_its_helpers():
+    game_state = PlayedGame(OPENING)
+    try:
+        move = ChessAI.Parallel_Search(game_state, game_state.GetValidMoves(), float("inf"), 2, max_depth=2)
+        helpers = [process.pid for process, connection in ChessAI.lazy_smp_helpers]
+        table = ChessAI.lazy_smp_table
+        game_state.MakeMove(move)
+        reply = ChessAI.Parallel_Search(game_state, game_state.GetValidMoves(), float("inf"), 2, max_depth=2)
+        assert reply in game_state.GetValidMoves()
+        assert [process.pid for process, connection in ChessAI.lazy_smp_helpers] == helpers
+        assert ChessAI.lazy_smp_table is table
+    finally:
+        ChessAI.Close_Lazy_SMP_Helpers()
+    assert ChessAI.lazy_smp_helpers == [] and ChessAI.lazy_smp_table is None
+
+
+def test_root_split_keeps_its_pool():
+    game_state = PlayedGame(OPENING)
+    try:
+        move = ChessAI.Root_Split_Search(game_state, game_state.GetValidMoves(), float("inf"), 2, max_depth=2)
+        pool = ChessAI.root_split_pool
+        game_state.MakeMove(move)
+        reply = ChessAI.Root_Split_Search(game_state, game_state.GetValidMoves(), float("inf"), 2, max_depth=2)
+        assert reply in game_state.GetValidMoves()
+        assert ChessAI.root_split_pool is pool
+    finally:
+        ChessAI.Close_Root_Split_Pool()
+
+
+def test_workers_setting_is_read_at_search_time(monkeypatch):
+    game_state = PlayedGame(OPENING)
+    monkeypatch.setattr(ChessAI, "WORKERS", 2)
+    monkeypatch.setattr(ChessAI, "PARALLEL_MODE", "lazy_smp")
+    try:
+        ChessAI.Search_Position(game_state, game_state.GetValidMoves(), 300)
+        assert len(ChessAI.lazy_smp_helpers) == 1
+    finally:
+        ChessAI.Close_Lazy_SMP_Helpers()
@@ -0,0 +1,35 @@
+""" Static Exchange Evaluation of captures with known exchange results, in pawn units"""
+import pytest
+from ChessEngine import GameState
+from ChessEvaluationTables import pieceScore
+
+# (FEN, capture, material won by the side capturing once the exchange is played out)
+EXCHANGES = [
+    ("1k1r4/1pp4p/p7/4p3/8/P5P1/1PP4P/2K1R3 w - - 0 1", "e1e5", 1),  # undefended pawn
+    ("1k1r3q/1ppn3p/p4b2/4p3/8/P2N2P1/1PP1R1BP/2K1Q3 w - - 0 1", "d3e5", -2),  # knight for a pawn, x-ray queen behind
+    ("4k3/8/3p4/4p3/8/8/8/4QK2 w - - 0 1", "e1e5", -8),  # queen takes a pawn defended by a pawn
+    ("4k3/8/3p4/4n3/8/5N2/8/4K3 w - - 0 1", "f3e5", 0),  # knight for knight
+    ("3qk3/3r4/3r4/8/8/3R4/3R4/3QK3 w - - 0 1", "d3d6", 5),  # doubled rooks, black doesn't give the queen
+    ("4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1", "e5d6", 1),  # en passant
+    ("8/8/5k2/3Rp3/8/8/8/4R1K1 w - - 0 1", "e1e5", 1),  # the king can't recapture a defended square
+    ("8/8/5k2/4p3/8/8/8/4R1K1 w - - 0 1", "e1e5", -4),  # but takes the undefended rook
+    ("7k/8/8/8/8/8/1p6/R6K b - - 0 1", "b2a1q", 13),  # rook captured with a promotion to queen
+]
+
+
+def StaticExchange(fen, capture):
+    game_state = GameState()
+    game_state.LoadFEN(fen)
+    return game_state.StaticExchangeEvaluation(game_state.ParseMove(capture), pieceScore)
+
+
+@pytest.mark.parametrize("fen, capture, result", EXCHANGES)
+def test_static_exchange(fen, capture, result):
+    assert StaticExchange(fen, capture) == result
+
+
+def test_cut_short_exchange_keeps_the_sign():
+    # the new queen is taken back (13 - 9 = 4), the exchange stops before as white is behind either way
+    assert StaticExchange("7k/8/8/8/8/8/1p6/R5QK b - - 0 1", "b2a1q") > 0
+    # pawn takes a knight defended by a pawn (3 - 1 = 2)
+    assert StaticExchange("4k3/8/3p4/4n3/3P4/8/8/4K3 w - - 0 1", "d4e5") > 0
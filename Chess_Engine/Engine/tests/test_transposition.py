@@ -0,0 +1,32 @@
+""" Store/probe round trips of the transposition table"""
+from ChessTransposition import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+
+MATE_THRESHOLD = 900
+
+
+def test_store_and_probe():
+    table = TranspositionTable(1, MATE_THRESHOLD)
+    table.Store(12345, 4, 37, EXACT, 0x1234, 0)
+    assert table.Probe(12345, 0) == (4, 37, EXACT, 0x1234)
+    assert table.Probe(54321, 0) is None
+    assert (table.hits, table.misses) == (1, 1)
+
+
+def test_mate_scores_are_stored_relative_to_the_node():
+    table = TranspositionTable(1, MATE_THRESHOLD)
+    table.Store(7, 2, 995, LOWER_BOUND, 0, 3) # mate in 5 plies from the root, found at ply 3
+    assert table.Probe(7, 1)[1] == 997 # the same mate seen 2 plies closer to the root
+
+
+def test_overwrites_count_replaced_positions():
+    table = TranspositionTable(1, MATE_THRESHOLD)
+    buckets = table.bucket_count
+    table.Store(1, 5, 10, EXACT, 0, 0) # depth-preferred slot
+    table.Store(1, 6, 11, EXACT, 0, 0) # same position, not an overwrite
+    table.Store(1 + buckets, 1, 12, UPPER_BOUND, 0, 0) # shallower, goes to the always-replace slot
+    assert table.overwrites == 0
+    table.Store(1 + 2 * buckets, 1, 13, UPPER_BOUND, 0, 0) # replaces the previous one
+    assert table.overwrites == 1
+    assert table.Probe(1 + buckets, 0) is None
+    assert table.Probe(1, 0) == (6, 11, EXACT, 0)
+    assert "overwrites: 1" in table.Stats()